@@ -1,20 +1,23 @@
+import asyncio
 from fastapi import Depends, HTTPException, Body
 from fastapi.security import OAuth2PasswordBearer
 from auth.jwt import verify_access_token
 from auth.hashing import verify_password
+from auth.principal_cache import cache_principal, get_cached_principal
 from sqlmodel import Session, select
-from db.database import get_session
+from sqlmodel.ext.asyncio.session import AsyncSession
+from db.database import get_async_session, get_session
 from models.user import User
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
 
-def get_current_user(token: str = Depends(oauth2_scheme), session: Session = Depends(get_session)):
+def _token_username(token: str) -> str:
     payload = verify_access_token(token)
     if not payload:
         raise HTTPException(status_code=401, detail="Invalid or expired token")
-    username = payload["sub"]
-    statement = select(User).where(User.username == username)
-    user = session.exec(statement).first()
+    return payload["sub"]
+
+def _principal(user: User | None) -> dict:
     if user is None:
         raise HTTPException(status_code=401, detail="User not found")
     return {
@@ -23,11 +26,40 @@ def get_current_user(token: str = Depends(oauth2_scheme), session: Session = Dep
         "role": user.role
     }
 
+def _check_role(current_user: dict, allowed_roles: tuple):
+    if current_user.get("role") not in allowed_roles:
+        raise HTTPException(status_code=403, detail="Insufficient permissions")
+    return current_user
+
+def get_current_user(token: str = Depends(oauth2_scheme), session: Session = Depends(get_session)):
+    username = _token_username(token)
+    principal = get_cached_principal(username)
+    if principal is not None:
+        return principal
+    statement = select(User).where(User.username == username)
+    principal = _principal(session.exec(statement).first())
+    cache_principal(principal)
+    return principal
+
+async def get_current_user_async(token: str = Depends(oauth2_scheme), session: AsyncSession = Depends(get_async_session)):
+    """Como get_current_user para las rutas async: comparte su AsyncSession y no pasa por el threadpool."""
+    username = _token_username(token)
+    principal = await asyncio.to_thread(get_cached_principal, username)
+    if principal is not None:
+        return principal
+    statement = select(User).where(User.username == username)
+    principal = _principal((await session.exec(statement)).first())
+    await asyncio.to_thread(cache_principal, principal)
+    return principal
+
 def require_role(*allowed_roles: str):
     def role_dependency(current_user: dict = Depends(get_current_user)):
-        if current_user.get("role") not in allowed_roles:
-            raise HTTPException(status_code=403, detail="Insufficient permissions")
-        return current_user
+        return _check_role(current_user, allowed_roles)
+    return role_dependency
+
+def require_role_async(*allowed_roles: str):
+    async def role_dependency(current_user: dict = Depends(get_current_user_async)):
+        return _check_role(current_user, allowed_roles)
     return role_dependency
 
 def verify_current_password(current_password: str = Body(...), current_user: dict = Depends(get_current_user), session: Session = Depends(get_session)):
@@ -1,11 +1,69 @@
+import asyncio
+import os
 import re
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
 from bcrypt import hashpw, gensalt, checkpw
 
+from services.instrumentation import timed
+
+# Coste de bcrypt y tamaño del pool dedicado a hashing
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", 12))
+HASHING_WORKERS = int(os.getenv("HASHING_WORKERS", 2))
+HASHING_MAX_PENDING = int(os.getenv("HASHING_MAX_PENDING", 32))
+HASHING_QUEUE_TIMEOUT = float(os.getenv("HASHING_QUEUE_TIMEOUT", 0))
+
+class HashingBusyError(Exception):
+    """Se lanza cuando el pool de hashing está saturado (se responde con 429)."""
+
+# bcrypt libera el GIL, así que un pool de hilos reparte el trabajo entre núcleos
+_executor = ThreadPoolExecutor(max_workers=HASHING_WORKERS, thread_name_prefix="bcrypt")
+_slots = threading.BoundedSemaphore(HASHING_MAX_PENDING)
+
+def _submit(fn, *args) -> Future:
+    if HASHING_QUEUE_TIMEOUT > 0:
+        acquired = _slots.acquire(timeout=HASHING_QUEUE_TIMEOUT)
+    else:
+        acquired = _slots.acquire(blocking=False)
+    if not acquired:
+        raise HashingBusyError("Too many password operations in progress, try again later")
+    try:
+        future = _executor.submit(fn, *args)
+    except BaseException:
+        _slots.release()
+        raise
+    future.add_done_callback(lambda _: _slots.release())
+    return future
+
+def _hash(password: str) -> str:
+    return hashpw(password.encode('utf-8'), gensalt(rounds=BCRYPT_ROUNDS)).decode('utf-8')
+
+def _verify(plain_password: str, hashed_password: str) -> bool:
+    return checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
+
+# Los tiempos de bcrypt incluyen la espera en la cola del pool
 def hash_password(password: str) -> str:
-    return hashpw(password.encode('utf-8'), gensalt()).decode('utf-8')
+    with timed("bcrypt"):
+        return _submit(_hash, password).result()
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
+    with timed("bcrypt"):
+        return _submit(_verify, plain_password, hashed_password).result()
+
+async def hash_password_async(password: str) -> str:
+    with timed("bcrypt"):
+        return await asyncio.wrap_future(_submit(_hash, password))
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    with timed("bcrypt"):
+        return await asyncio.wrap_future(_submit(_verify, plain_password, hashed_password))
+
+def needs_rehash(hashed_password: str) -> bool:
+    """Indica si el hash se generó con un coste distinto al configurado."""
+    try:
+        return int(hashed_password.split("$")[2]) != BCRYPT_ROUNDS
+    except (IndexError, ValueError):
+        return True
 
 def validate_password_strength(password: str) -> None:
     if len(password) < 8:
@@ -1,7 +1,8 @@
 import os
+import uuid
 from datetime import datetime, timedelta, timezone
 from jose import jwt, JWTError
-from auth.redis_client import client_redis, revoke_token as redis_revoke_token
+from auth.revocation import is_revoked, revoke, token_fingerprint
 
 
 SECRET_KEY = os.getenv("SECRET_KEY")
@@ -10,8 +11,6 @@ ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 15
 REFRESH_TOKEN_EXPIRE_DAYS = 1
 
-REVOKED_TOKENS_KEY = "revoked_tokens"
-
 # Archivo para almacenar tokens revocados
 # REVOKED_TOKENS_FILE = "revoked_tokens.txt"
 
@@ -31,7 +30,7 @@ def create_access_token(data: dict, role: str, expires_minutes: int = None):
         }
         expires_minutes = role_expiration.get(role, ACCESS_TOKEN_EXPIRE_MINUTES)  # Default 15 minutes
     expire = datetime.now(timezone.utc) + timedelta(minutes=expires_minutes)
-    to_encode.update({"exp": expire, "role": role})
+    to_encode.update({"exp": expire, "role": role, "jti": uuid.uuid4().hex})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
 def create_refresh_token(data: dict):
@@ -42,9 +41,9 @@ def create_refresh_token(data: dict):
 
 def verify_access_token(token: str):
     try:
-        if is_token_revoked(token):  # Verificar si el token está revocado
-            raise JWTError("Token has been revoked")
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        if is_revoked(payload.get("jti") or token_fingerprint(token)):  # Verificar si el token está revocado
+            raise JWTError("Token has been revoked")
         return payload
     except JWTError:
         return None
@@ -58,7 +57,7 @@ def verify_refresh_token(token: str):
 
 def revoke_token(token: str, expires_in: int = None):
     """
-    Revocar un token y almacenarlo en Redis.
+    Revocar un token y almacenar su identificador (jti o hash) en Redis.
     Si no se indica `expires_in`, se calcula según el tiempo restante en el token.
     """
     try:
@@ -68,10 +67,17 @@ def revoke_token(token: str, expires_in: int = None):
             exp_time = datetime.fromtimestamp(exp_timestamp, timezone.utc)
             expires_in = int((exp_time - datetime.now(timezone.utc)).total_seconds())
         if expires_in and expires_in > 0:
-            redis_revoke_token(token, expires_in)
+            revoke(token_id(token), expires_in)
+    except JWTError:
+        revoke(token_id(token), 900)  # 15 minutos de retención por defecto
+
+def token_id(token: str) -> str:
+    """Identificador con el que se guarda la revocación: el jti o, si no lo tiene, un hash del token."""
+    try:
+        return jwt.get_unverified_claims(token).get("jti") or token_fingerprint(token)
     except JWTError:
-        redis_revoke_token(token, 900)  # 15 minutos de retención por defecto
+        return token_fingerprint(token)
 
 def is_token_revoked(token: str) -> bool:
     """Verifica si un token ha sido revocado."""
-    return client_redis.exists(f"REVOKED_TOKENS_KEY:{token}") == 1
\ No newline at end of file
+    return is_revoked(token_id(token))
\ No newline at end of file
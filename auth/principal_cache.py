@@ -0,0 +1,45 @@
+import json
+import os
+from logging import getLogger
+from redis import RedisError
+from auth.redis_client import client_redis
+
+logger = getLogger(__name__)
+
+PRINCIPAL_CACHE_TTL = int(os.getenv("PRINCIPAL_CACHE_TTL", 60))
+PRINCIPAL_CACHE_KEY = "PRINCIPAL_CACHE"
+
+def get_cached_principal(username: str) -> dict | None:
+    """Devuelve {id, username, role} del usuario autenticado si está en caché."""
+    try:
+        value = client_redis.get(f"{PRINCIPAL_CACHE_KEY}:{username}")
+    except RedisError as e:
+        logger.warning(f"Principal cache read failed for {username}: {e}")
+        return None
+    return json.loads(value) if value else None
+
+def cache_principal(principal: dict):
+    try:
+        client_redis.setex(f"{PRINCIPAL_CACHE_KEY}:{principal['username']}", PRINCIPAL_CACHE_TTL, json.dumps(principal))
+    except RedisError as e:
+        logger.warning(f"Principal cache write failed for {principal['username']}: {e}")
+
+def invalidate_principal(*usernames: str):
+    """Elimina de la caché los usuarios indicados (tras modificarlos o borrarlos)."""
+    keys = [f"{PRINCIPAL_CACHE_KEY}:{username}" for username in usernames if username]
+    if not keys:
+        return
+    try:
+        client_redis.delete(*keys)
+    except RedisError as e:
+        # La escritura ya está confirmada; la entrada caducará con PRINCIPAL_CACHE_TTL
+        logger.warning(f"Principal cache invalidation failed for {', '.join(usernames)}: {e}")
+
+def clear_principals():
+    """Vacía la caché de principales (tras borrar o regenerar los usuarios en bloque)."""
+    try:
+        keys = list(client_redis.scan_iter(match=f"{PRINCIPAL_CACHE_KEY}:*", count=1000))
+        if keys:
+            client_redis.delete(*keys)
+    except RedisError as e:
+        logger.warning(f"Principal cache clear failed: {e}")
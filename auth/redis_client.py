@@ -1,16 +1,27 @@
 import os
 import redis
-from datetime import timedelta
+from redis.client import Pipeline
+
+from services.instrumentation import timed
 
 # Conexión a Redis
 REDIS_HOST = os.getenv("REDIS_HOST", "redis")
 REDIS_PORT = int(os.getenv("REDIS_PORT", 6379))
-client_redis = redis.StrictRedis(host=REDIS_HOST, port=REDIS_PORT, decode_responses=True)
 
-def revoke_token(token: str, expiration: int):
-    """Revoca un token almacenándolo en Redis con un tiempo de expiración."""
-    client_redis.setex(token, timedelta(seconds=expiration), "revoked")
+class InstrumentedPipeline(Pipeline):
+    # Un pipeline es un único viaje de ida y vuelta
+    def execute(self, raise_on_error=True):
+        with timed("redis"):
+            return super().execute(raise_on_error)
+
+class InstrumentedRedis(redis.StrictRedis):
+    """Cliente de Redis que mide cada llamada en la petición en curso."""
+
+    def execute_command(self, *args, **options):
+        with timed("redis"):
+            return super().execute_command(*args, **options)
+
+    def pipeline(self, transaction=True, shard_hint=None):
+        return InstrumentedPipeline(self.connection_pool, self.response_callbacks, transaction, shard_hint)
 
-def is_token_revoked(token: str) -> bool:
-    """Verifica si un token ha sido revocado."""
-    return client_redis.exists(token) == 1
\ No newline at end of file
+client_redis = InstrumentedRedis(host=REDIS_HOST, port=REDIS_PORT, decode_responses=True)
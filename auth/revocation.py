@@ -0,0 +1,125 @@
+import hashlib
+import math
+import os
+import threading
+import time
+from logging import getLogger
+from redis import RedisError
+from auth.redis_client import client_redis
+
+logger = getLogger(__name__)
+
+REVOKED_TOKENS_KEY = "revoked_tokens"
+REVOCATION_CHANNEL = "revoked_tokens"
+
+REVOCATION_FILTER = os.getenv("REVOCATION_FILTER", "yes").lower() == "yes"
+REVOCATION_FILTER_CAPACITY = int(os.getenv("REVOCATION_FILTER_CAPACITY", 100000))
+REVOCATION_FILTER_ERROR_RATE = float(os.getenv("REVOCATION_FILTER_ERROR_RATE", 0.001))
+REVOCATION_FILTER_REBUILD = int(os.getenv("REVOCATION_FILTER_REBUILD", 900))
+
+
+class BloomFilter:
+    """Filtro de Bloom simple: sin falsos negativos, falsos positivos acotados."""
+
+    def __init__(self, capacity: int, error_rate: float):
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, value: str):
+        digest = hashlib.blake2b(value.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "big")
+        h2 = int.from_bytes(digest[8:], "big") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, value: str):
+        for position in self._positions(value):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, value: str) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(value))
+
+
+class RevocationFilter:
+    """
+    Filtro local (por worker) de tokens revocados.
+    Se mantiene al día con el canal pub/sub de Redis y se reconstruye
+    periódicamente con SCAN para descartar las revocaciones caducadas.
+    Mientras no está sincronizado, todas las consultas van a Redis.
+    """
+
+    def __init__(self):
+        self.ready = False
+        self._filter = BloomFilter(REVOCATION_FILTER_CAPACITY, REVOCATION_FILTER_ERROR_RATE)
+        self._stop = threading.Event()
+        self._thread = None
+
+    def add(self, token_id: str):
+        self._filter.add(token_id)
+
+    def might_contain(self, token_id: str) -> bool:
+        return token_id in self._filter
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="revocation-filter", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        self.ready = False
+
+    def _rebuild(self):
+        new_filter = BloomFilter(REVOCATION_FILTER_CAPACITY, REVOCATION_FILTER_ERROR_RATE)
+        prefix_length = len(REVOKED_TOKENS_KEY) + 1
+        for key in client_redis.scan_iter(match=f"{REVOKED_TOKENS_KEY}:*", count=1000):
+            new_filter.add(key[prefix_length:])
+        self._filter = new_filter
+
+    def _run(self):
+        while not self._stop.is_set():
+            pubsub = client_redis.pubsub(ignore_subscribe_messages=True)
+            try:
+                # Suscribirse antes de recorrer Redis para no perder revocaciones intermedias
+                pubsub.subscribe(REVOCATION_CHANNEL)
+                self._rebuild()
+                self.ready = True
+                next_rebuild = time.monotonic() + REVOCATION_FILTER_REBUILD
+                while not self._stop.is_set():
+                    message = pubsub.get_message(timeout=1.0)
+                    if message:
+                        self.add(message["data"])
+                    if time.monotonic() >= next_rebuild:
+                        self._rebuild()
+                        next_rebuild = time.monotonic() + REVOCATION_FILTER_REBUILD
+            except RedisError as e:
+                self.ready = False
+                logger.warning(f"Revocation filter lost sync with Redis: {e}")
+                self._stop.wait(1)
+            finally:
+                pubsub.close()
+
+
+revocation_filter = RevocationFilter()
+
+
+def token_fingerprint(token: str) -> str:
+    """Identificador compacto para tokens sin jti (no se guarda el token completo)."""
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+def revoke(token_id: str, expiration: int):
+    """Revoca un identificador de token en Redis y lo notifica al resto de workers."""
+    pipeline = client_redis.pipeline()
+    pipeline.setex(f"{REVOKED_TOKENS_KEY}:{token_id}", expiration, "revoked")
+    pipeline.publish(REVOCATION_CHANNEL, token_id)
+    pipeline.execute()
+    revocation_filter.add(token_id)
+
+def is_revoked(token_id: str) -> bool:
+    if REVOCATION_FILTER and revocation_filter.ready and not revocation_filter.might_contain(token_id):
+        return False
+    return client_redis.exists(f"{REVOKED_TOKENS_KEY}:{token_id}") == 1
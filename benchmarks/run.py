@@ -0,0 +1,267 @@
+"""
+Benchmark de carga de la API.
+
+Arranca el catálogo stub y la aplicación con uvicorn contra el Postgres y el
+Redis configurados en .env, ejecuta los escenarios con la concurrencia pedida
+y guarda los resultados en JSON para comparar entre commits.
+
+    docker-compose up -d db redis
+    python -m benchmarks.run --generate --scenarios login_storm,order_listing_cursor --concurrency 32
+    python -m benchmarks.run --compare benchmarks/results/<commit anterior>.json
+
+Con --generate se regeneran los datos con scripts.generate_data (vacía las tablas).
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+import httpx
+from benchmarks.scenarios import SCENARIOS
+
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+PROJECT_DIR = Path(__file__).resolve().parent.parent
+
+
+def percentile(values: list[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def parse_server_timing(header: str) -> dict:
+    """{"db": (ms, desc), ...} a partir de la cabecera Server-Timing."""
+    metrics = {}
+    for entry in header.split(","):
+        name, *params = (part.strip() for part in entry.split(";"))
+        values = dict(param.split("=", 1) for param in params if "=" in param)
+        metrics[name] = (float(values.get("dur", 0)), values.get("desc", "").strip('"'))
+    return metrics
+
+
+def _process_tree(pid: int) -> list[int]:
+    pids = [pid]
+    try:
+        children = Path(f"/proc/{pid}/task/{pid}/children").read_text().split()
+    except OSError:
+        return pids
+    for child in children:
+        pids.extend(_process_tree(int(child)))
+    return pids
+
+
+def _rss_mb(pid: int) -> float:
+    try:
+        for line in Path(f"/proc/{pid}/status").read_text().splitlines():
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return 0.0
+
+
+def worker_rss(pid: int) -> dict[int, float]:
+    """RSS en MB del proceso de uvicorn y de cada uno de sus workers."""
+    return {child: round(_rss_mb(child), 1) for child in _process_tree(pid)}
+
+
+def start_server(app: str, port: int, env: dict, workers: int = 1) -> subprocess.Popen:
+    command = [sys.executable, "-m", "uvicorn", app, "--port", str(port), "--workers", str(workers), "--log-level", "warning"]
+    return subprocess.Popen(command, cwd=PROJECT_DIR, env={**os.environ, **env})
+
+
+async def wait_until_ready(url: str, timeout: float = 60):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                await client.get(url)
+                return
+            except httpx.TransportError:
+                await asyncio.sleep(0.25)
+    raise RuntimeError(f"{url} did not start within {timeout}s")
+
+
+async def run_scenario(scenario, client: httpx.AsyncClient, requests: int, concurrency: int, server_pid: int) -> dict:
+    await scenario.setup(client)
+
+    latencies, db_statements, statuses = [], [], Counter()
+    server_ms = {}
+    peak_rss = {}
+    next_request = iter(range(requests))
+
+    async def worker():
+        for i in next_request:
+            started = time.perf_counter()
+            try:
+                response = await scenario.request(client, i)
+                # Leer el cuerpo completo: en los informes en streaming el tiempo incluye la descarga
+                await response.aread()
+                statuses[response.status_code] += 1
+                if "Server-Timing" in response.headers:
+                    timing = parse_server_timing(response.headers["Server-Timing"])
+                    for name, (duration, _) in timing.items():
+                        server_ms.setdefault(name, []).append(duration)
+                    if "db" in timing:
+                        db_statements.append(int(timing["db"][1] or 0))
+            except httpx.HTTPError as e:
+                statuses[type(e).__name__] += 1
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    async def sample_rss():
+        while True:
+            for pid, rss in worker_rss(server_pid).items():
+                peak_rss[pid] = max(peak_rss.get(pid, 0.0), rss)
+            await asyncio.sleep(0.5)
+
+    sampler = asyncio.create_task(sample_rss())
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    duration = time.perf_counter() - started
+    sampler.cancel()
+
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "duration_s": round(duration, 3),
+        "throughput_rps": round(requests / duration, 2) if duration else 0.0,
+        "latency_ms": {
+            "mean": round(statistics.fmean(latencies), 2) if latencies else 0.0,
+            "p50": round(percentile(latencies, 50), 2),
+            "p95": round(percentile(latencies, 95), 2),
+            "p99": round(percentile(latencies, 99), 2),
+            "max": round(max(latencies, default=0.0), 2),
+        },
+        "status_codes": {str(status): count for status, count in statuses.items()},
+        "db_statements": {
+            "mean": round(statistics.fmean(db_statements), 2) if db_statements else None,
+            "max": max(db_statements, default=None),
+        },
+        # Media del desglose de Server-Timing (hasta el inicio de la respuesta)
+        "server_timing_ms": {name: round(statistics.fmean(values), 2) for name, values in server_ms.items()},
+        "peak_rss_mb": {str(pid): rss for pid, rss in peak_rss.items()},
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=PROJECT_DIR, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(current: dict, previous: dict):
+    print(f"\nComparison with {previous.get('commit')}:")
+    print(f"{'scenario':<24} {'rps':>18} {'p95 ms':>22} {'db stmts':>12}")
+    for name, result in current["scenarios"].items():
+        old = previous.get("scenarios", {}).get(name)
+        if not old:
+            continue
+        rps = f"{old['throughput_rps']} -> {result['throughput_rps']}"
+        p95 = f"{old['latency_ms']['p95']} -> {result['latency_ms']['p95']}"
+        statements = f"{old['db_statements']['mean']} -> {result['db_statements']['mean']}"
+        print(f"{name:<24} {rps:>18} {p95:>22} {statements:>12}")
+
+
+def print_summary(results: dict):
+    print(f"\n{'scenario':<24} {'rps':>9} {'p50':>9} {'p95':>9} {'p99':>9} {'db stmts':>9}  status")
+    for name, result in results["scenarios"].items():
+        latency = result["latency_ms"]
+        print(
+            f"{name:<24} {result['throughput_rps']:>9} {latency['p50']:>9} {latency['p95']:>9} "
+            f"{latency['p99']:>9} {str(result['db_statements']['mean']):>9}  {result['status_codes']}"
+        )
+
+
+async def main_async(options):
+    stub_url = f"http://127.0.0.1:{options.stub_port}"
+    app_url = f"http://127.0.0.1:{options.app_port}"
+    stub = start_server("scripts.stub_catalog:app", options.stub_port, {
+        "STUB_CATALOG_SIZE": str(options.products),
+        "STUB_CATALOG_LATENCY_MS": str(options.stub_latency_ms),
+    })
+    app = start_server("main:app", options.app_port, {
+        "PRODUCT_API_URL": f"{stub_url}/products",
+        "SERVER_TIMING": "yes",
+    }, workers=options.workers)
+    try:
+        await wait_until_ready(f"{stub_url}/stats")
+        await wait_until_ready(f"{app_url}/docs")
+
+        results = {
+            "commit": git_commit(),
+            "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "options": vars(options),
+            "scenarios": {},
+        }
+        limits = httpx.Limits(max_connections=options.concurrency, max_keepalive_connections=options.concurrency)
+        async with httpx.AsyncClient(base_url=app_url, timeout=options.timeout, limits=limits) as client:
+            for name in options.scenarios.split(","):
+                print(f"Running {name} ({options.requests} requests, concurrency {options.concurrency})...")
+                scenario = SCENARIOS[name](options)
+                results["scenarios"][name] = await run_scenario(
+                    scenario, client, options.requests, options.concurrency, app.pid
+                )
+        return results
+    finally:
+        for process in (app, stub):
+            process.terminate()
+            process.wait(timeout=30)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help=f"lista separada por comas: {', '.join(SCENARIOS)}")
+    parser.add_argument("--requests", type=int, default=500, help="peticiones por escenario")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--workers", type=int, default=1, help="workers de uvicorn para la aplicación")
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--generate", action="store_true", help="regenerar los datos antes de empezar (vacía las tablas)")
+    parser.add_argument("--users", type=int, default=1_000)
+    parser.add_argument("--orders", type=int, default=10_000)
+    parser.add_argument("--items", type=int, default=100_000)
+    parser.add_argument("--products", type=int, default=194, help="tamaño del catálogo stub")
+    parser.add_argument("--username", default="user1", help="usuario admin de los escenarios autenticados")
+    parser.add_argument("--password", default="password")
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--deep-page", type=int, default=50, help="página profunda de los listados")
+    parser.add_argument("--report-limit", type=int, default=1_000)
+    parser.add_argument("--stub-latency-ms", type=int, default=0)
+    parser.add_argument("--app-port", type=int, default=8100)
+    parser.add_argument("--stub-port", type=int, default=8101)
+    parser.add_argument("--output", type=Path, help="fichero JSON de resultados (por defecto results/<commit>.json)")
+    parser.add_argument("--compare", type=Path, help="resultados anteriores con los que comparar")
+    options = parser.parse_args()
+
+    unknown = set(options.scenarios.split(",")) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+
+    if options.generate:
+        from scripts.generate_data import generate
+        generate(options.users, options.orders, options.items, options.seed, options.products, 1, options.password)
+
+    results = asyncio.run(main_async(options))
+    print_summary(results)
+
+    output = options.output or RESULTS_DIR / f"{results['commit']}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    results["options"] = {key: str(value) if isinstance(value, Path) else value for key, value in results["options"].items()}
+    output.write_text(json.dumps(results, indent=2))
+    print(f"\nResults written to {output}")
+
+    if options.compare:
+        compare(results, json.loads(options.compare.read_text()))
+
+
+if __name__ == "__main__":
+    main()
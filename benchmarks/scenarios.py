@@ -0,0 +1,142 @@
+"""
+Escenarios del benchmark. Cada escenario prepara su contexto una vez (`setup`)
+y después el runner lanza `request(client, i)` tantas veces como se pida.
+"""
+import asyncio
+import random
+import httpx
+
+API = "/api"
+
+
+class Scenario:
+    name = ""
+
+    def __init__(self, options):
+        self.options = options
+        self.rng = random.Random(options.seed)
+
+    async def setup(self, client: httpx.AsyncClient):
+        pass
+
+    async def request(self, client: httpx.AsyncClient, i: int) -> httpx.Response:
+        raise NotImplementedError
+
+
+async def login(client: httpx.AsyncClient, username: str, password: str) -> dict:
+    response = await client.post(f"{API}/auth/login", data={"username": username, "password": password})
+    response.raise_for_status()
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+class AuthenticatedScenario(Scenario):
+    async def setup(self, client: httpx.AsyncClient):
+        self.headers = await login(client, self.options.username, self.options.password)
+
+
+class LoginStorm(Scenario):
+    """Inicios de sesión concurrentes de usuarios distintos (coste de bcrypt)."""
+    name = "login_storm"
+
+    def _username(self, i: int) -> str:
+        return f"user{i % self.options.users + 1}"
+
+    async def _login(self, client, username: str):
+        return await client.post(f"{API}/auth/login", data={"username": username, "password": self.options.password})
+
+    async def setup(self, client):
+        # Un login previo de cada usuario: si su hash tiene otro coste, el primer login lo
+        # rehace y actualiza el usuario, y la medida dependería de los logins anteriores
+        slots = asyncio.Semaphore(self.options.concurrency)
+
+        async def warm_up(username):
+            async with slots:
+                await self._login(client, username)
+
+        users = {self._username(i) for i in range(self.options.requests)}
+        await asyncio.gather(*(warm_up(username) for username in users))
+
+    async def request(self, client, i):
+        return await self._login(client, self._username(i))
+
+
+class AddItemBurst(AuthenticatedScenario):
+    """Ráfagas de productos añadidos a pedidos existentes (catálogo stub + upsert)."""
+    name = "add_item_burst"
+
+    async def request(self, client, i):
+        payload = {
+            "item_id": self.rng.randint(1, self.options.products),
+            "order_id": i % self.options.orders + 1,
+            "quantity": 1,
+        }
+        return await client.post(f"{API}/items/add_item", json=payload, headers=self.headers)
+
+
+class OrderListingOffset(AuthenticatedScenario):
+    """Página profunda del listado de pedidos con OFFSET."""
+    name = "order_listing_offset"
+
+    async def request(self, client, i):
+        params = {"skip": self.options.deep_page * self.options.page_size, "limit": self.options.page_size}
+        return await client.get(f"{API}/orders/", params=params, headers=self.headers)
+
+
+class OrderListingCursor(AuthenticatedScenario):
+    """La misma página profunda del listado de pedidos, alcanzada por cursor."""
+    name = "order_listing_cursor"
+
+    async def setup(self, client):
+        await super().setup(client)
+        # Recorrer las páginas una vez para obtener el cursor de la página profunda
+        self.cursor = None
+        params = {"limit": self.options.page_size}
+        for _ in range(self.options.deep_page):
+            response = await client.get(f"{API}/orders/", params=params, headers=self.headers)
+            response.raise_for_status()
+            self.cursor = response.headers.get("X-Next-Cursor")
+            if not self.cursor:
+                break
+            params = {"limit": self.options.page_size, "cursor": self.cursor}
+
+    async def request(self, client, i):
+        params = {"limit": self.options.page_size}
+        if self.cursor:
+            params["cursor"] = self.cursor
+        return await client.get(f"{API}/orders/", params=params, headers=self.headers)
+
+
+class Report(AuthenticatedScenario):
+    report_format = ""
+    # CSV y PDF exigen un pedido; el Excel de admin puede exportar todos los ítems
+    per_order = True
+
+    async def request(self, client, i):
+        params = {"limit": self.options.report_limit}
+        if self.per_order:
+            params["order_id"] = i % self.options.orders + 1
+        return await client.get(f"{API}/report/{self.report_format}", params=params, headers=self.headers)
+
+
+class CsvReport(Report):
+    name = "report_csv"
+    report_format = "csv"
+
+
+class ExcelReport(Report):
+    name = "report_excel"
+    report_format = "excel"
+    per_order = False
+
+
+class PdfReport(Report):
+    name = "report_pdf"
+    report_format = "pdf"
+
+
+SCENARIOS = {
+    scenario.name: scenario
+    for scenario in (
+        LoginStorm, AddItemBurst, OrderListingOffset, OrderListingCursor, CsvReport, ExcelReport, PdfReport
+    )
+}
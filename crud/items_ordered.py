@@ -1,61 +1,230 @@
+import asyncio
+import os
+import httpx
+from sqlalchemy import and_, delete, func, tuple_
+from sqlalchemy.dialects.postgresql import insert
 from sqlmodel import Session, select
-from models.items_ordered import ItemsOrdered
+from sqlmodel.ext.asyncio.session import AsyncSession
+from models.items_ordered import ItemsOrdered, ItemsOrderedBulkEntry
 from models.order import Order
-import httpx
+from models.product import Product, product_content_hash
+from crud.pagination import paginate
+from services.data_versions import bump_versions, order_entity
+from services.product_catalog import get_product
+
+# Máximo de peticiones simultáneas a la API de productos en una carga masiva
+BULK_FETCH_CONCURRENCY = int(os.getenv("BULK_FETCH_CONCURRENCY", 10))
+# Reintentos al guardar una versión nueva de un producto si otra petición ocupa el mismo número
+SNAPSHOT_INSERT_ATTEMPTS = 3
+
+ITEM_CURSOR_COLUMNS = (ItemsOrdered.id,)
+
+# Columnas de lectura de un ítem: la línea del pedido más los datos de su versión del producto
+ITEM_READ_COLUMNS = (
+    ItemsOrdered.id,
+    ItemsOrdered.item_id,
+    ItemsOrdered.order_id,
+    ItemsOrdered.quantity,
+    ItemsOrdered.price,
+    Product.title,
+    Product.description,
+    Product.category,
+    Product.rating,
+    Product.brand,
+)
+
+def _item_statement(item_id: int, order_id: int):
+    return select(ItemsOrdered).where(
+        ItemsOrdered.item_id == item_id,
+        ItemsOrdered.order_id == order_id
+    )
+
+def _select_items(columns: tuple = None):
+    return select(*(columns or ITEM_READ_COLUMNS)).select_from(ItemsOrdered).join(
+        Product,
+        and_(Product.item_id == ItemsOrdered.item_id, Product.version == ItemsOrdered.product_version)
+    )
+
+def _item_read_statement(*ids: int):
+    return _select_items().where(ItemsOrdered.id.in_(ids)).order_by(ItemsOrdered.id)
+
+def _snapshot_row(product: dict) -> dict:
+    row = {
+        "item_id": product["id"],
+        "title": product["title"],
+        "description": product.get("description", ""),
+        "category": product.get("category", ""),
+        "price": product.get("price", 0.0),
+        "rating": product.get("rating", 0.0),
+        "brand": product.get("brand", ""),
+    }
+    row["content_hash"] = product_content_hash(row)
+    return row
+
+def _snapshot_versions_statement(snapshots: list[dict]):
+    keys = [(snapshot["item_id"], snapshot["content_hash"]) for snapshot in snapshots]
+    return select(Product.item_id, Product.version).where(tuple_(Product.item_id, Product.content_hash).in_(keys))
 
+def _snapshot_insert_statement(snapshots: list[dict]):
+    table = Product.__table__
+    rows = []
+    for snapshot in snapshots:
+        next_version = select(func.coalesce(func.max(table.c.version), 0) + 1).where(
+            table.c.item_id == snapshot["item_id"]
+        ).scalar_subquery()
+        rows.append({**snapshot, "version": next_version})
+    return insert(table).values(rows).on_conflict_do_nothing()
 
-url = "https://dummyjson.com/products"
-
-async def add_item_ordered(session: Session, product_id: int, order_id: int, quantity: int):
-    async with httpx.AsyncClient(verify=False) as client:
-        response = await client.get(f"{url}/{product_id}")
-        if response.status_code != 200:
-            raise ValueError(f"Product with id {product_id} not found in API.")
-        product = response.json()
-    
-    existing_item = session.exec(
-        select(ItemsOrdered).where(
-            ItemsOrdered.item_id == product["id"],
-            ItemsOrdered.order_id == order_id
-        )
-    ).first()
-    if existing_item:
-        existing_item.quantity += quantity
-        session.commit()
-        session.refresh(existing_item)
-        return existing_item
-
-    item = ItemsOrdered(
-        item_id=product["id"],
-        title=product["title"],
-        description=product.get("description", ""),
-        category=product.get("category", ""),
-        price=product.get("price", 0.0),
-        rating=product.get("rating", 0.0),
-        brand=product.get("brand", ""),
+def _product_versions(session: Session, snapshots: list[dict]) -> dict[int, int]:
+    """Versión de cada producto en la tabla product; se crea una nueva si sus datos han cambiado."""
+    versions = dict(session.execute(_snapshot_versions_statement(snapshots)).all())
+    for _ in range(SNAPSHOT_INSERT_ATTEMPTS):
+        missing = [snapshot for snapshot in snapshots if snapshot["item_id"] not in versions]
+        if not missing:
+            return versions
+        session.execute(_snapshot_insert_statement(missing))
+        versions.update(session.execute(_snapshot_versions_statement(missing)).all())
+    raise RuntimeError("Could not store the product snapshot.")
+
+async def _product_versions_async(session: AsyncSession, snapshots: list[dict]) -> dict[int, int]:
+    versions = dict((await session.execute(_snapshot_versions_statement(snapshots))).all())
+    for _ in range(SNAPSHOT_INSERT_ATTEMPTS):
+        missing = [snapshot for snapshot in snapshots if snapshot["item_id"] not in versions]
+        if not missing:
+            return versions
+        await session.execute(_snapshot_insert_statement(missing))
+        versions.update((await session.execute(_snapshot_versions_statement(missing))).all())
+    raise RuntimeError("Could not store the product snapshot.")
+
+def _new_item(snapshot: dict, version: int, order_id: int, quantity: int):
+    return ItemsOrdered(
+        item_id=snapshot["item_id"],
+        product_version=version,
+        price=snapshot["price"],
         order_id=order_id,
         quantity=quantity
     )
-    session.add(item)
-    session.commit()
-    session.refresh(item)
-    return item
 
-def get_items_ordered(session: Session, order_id: int = None, user_id: int = None, item_id: int = None, skip: int = 0, limit: int = 100):
-    statement = select(ItemsOrdered)
+async def _fetch_bulk_products(items: list[ItemsOrderedBulkEntry], client: httpx.AsyncClient = None):
+    quantities = {}
+    for entry in items:
+        quantities[entry.item_id] = quantities.get(entry.item_id, 0) + entry.quantity
+
+    semaphore = asyncio.Semaphore(BULK_FETCH_CONCURRENCY)
+
+    async def fetch(product_id: int):
+        async with semaphore:
+            return await get_product(product_id, client)
+
+    products = await asyncio.gather(*(fetch(product_id) for product_id in quantities))
+    return quantities, [_snapshot_row(product) for product in products]
+
+def _bulk_upsert_statement(order_id: int, quantities: dict, snapshots: list[dict], versions: dict[int, int]):
+    rows = [{
+        "item_id": snapshot["item_id"],
+        "product_version": versions[snapshot["item_id"]],
+        "price": snapshot["price"],
+        "order_id": order_id,
+        "quantity": quantities[product_id]
+    } for product_id, snapshot in zip(quantities, snapshots)]
+
+    table = ItemsOrdered.__table__
+    statement = insert(table).values(rows)
+    return statement.on_conflict_do_update(
+        index_elements=[table.c.order_id, table.c.item_id],
+        set_={"quantity": table.c.quantity + statement.excluded.quantity}
+    ).returning(table.c.id)
+
+def _user_orders_statement(user_id: int):
+    return select(Order.id).where(Order.owner_id == user_id)
+
+def _items_statement(order_id: int = None, user_id: int = None, item_id: int = None, skip: int = 0, limit: int = 100, columns: tuple = None, cursor: str = None):
+    statement = _select_items(columns)
     if order_id is not None:
         statement = statement.where(ItemsOrdered.order_id == order_id)
     elif user_id is not None:
-        user_orders = session.exec(select(Order.id).where(Order.owner_id == user_id)).all()
-        if not user_orders:
-            raise ValueError(f"No orders found for user with id {user_id}.")
-        statement = statement.where(ItemsOrdered.order_id.in_(user_orders))
+        # Subconsulta en la propia sentencia: los ids de pedidos no pasan por Python
+        statement = statement.where(ItemsOrdered.order_id.in_(_user_orders_statement(user_id)))
 
     if item_id is not None:
         statement = statement.where(ItemsOrdered.item_id == item_id)
 
-    statement = statement.offset(skip).limit(limit)
-    items = session.exec(statement).all()
+    return paginate(statement, ITEM_CURSOR_COLUMNS, cursor, skip, limit)
+
+async def add_item_ordered(session: Session, product_id: int, order_id: int, quantity: int, client: httpx.AsyncClient = None):
+    product = await get_product(product_id, client)
+
+    item = session.exec(_item_statement(product["id"], order_id)).first()
+    if item:
+        # La línea conserva la versión del producto y el precio de la primera compra
+        item.quantity += quantity
+    else:
+        snapshot = _snapshot_row(product)
+        version = _product_versions(session, [snapshot])[snapshot["item_id"]]
+        item = _new_item(snapshot, version, order_id, quantity)
+        session.add(item)
+    session.flush()
+    row_id = item.id
+    session.commit()
+    bump_versions("items", order_entity(order_id))
+    return session.execute(_item_read_statement(row_id)).one()
+
+async def add_item_ordered_async(session: AsyncSession, product_id: int, order_id: int, quantity: int, client: httpx.AsyncClient = None):
+    product = await get_product(product_id, client)
+
+    item = (await session.exec(_item_statement(product["id"], order_id))).first()
+    if item:
+        item.quantity += quantity
+    else:
+        snapshot = _snapshot_row(product)
+        version = (await _product_versions_async(session, [snapshot]))[snapshot["item_id"]]
+        item = _new_item(snapshot, version, order_id, quantity)
+        session.add(item)
+    await session.flush()
+    row_id = item.id
+    await session.commit()
+    await asyncio.to_thread(bump_versions, "items", order_entity(order_id))
+    return (await session.execute(_item_read_statement(row_id))).one()
+
+async def add_items_ordered_bulk(session: Session, order_id: int, items: list[ItemsOrderedBulkEntry], client: httpx.AsyncClient = None):
+    quantities, snapshots = await _fetch_bulk_products(items, client)
+    versions = _product_versions(session, snapshots)
+    row_ids = session.execute(_bulk_upsert_statement(order_id, quantities, snapshots, versions)).scalars().all()
+    session.commit()
+    bump_versions("items", order_entity(order_id))
+    return session.execute(_item_read_statement(*row_ids)).all()
+
+async def add_items_ordered_bulk_async(session: AsyncSession, order_id: int, items: list[ItemsOrderedBulkEntry], client: httpx.AsyncClient = None):
+    quantities, snapshots = await _fetch_bulk_products(items, client)
+    versions = await _product_versions_async(session, snapshots)
+    row_ids = (await session.execute(_bulk_upsert_statement(order_id, quantities, snapshots, versions))).scalars().all()
+    await session.commit()
+    await asyncio.to_thread(bump_versions, "items", order_entity(order_id))
+    return (await session.execute(_item_read_statement(*row_ids))).all()
+
+def _user_without_orders(user_id: int):
+    return ValueError(f"No orders found for user with id {user_id}.")
+
+def items_ordered_statement(session: Session, order_id: int = None, user_id: int = None, item_id: int = None, skip: int = 0, limit: int = 100, columns: tuple = None, cursor: str = None):
+    """Consulta filtrada de ítems; con `columns` se seleccionan solo esas columnas en lugar de la entidad."""
+    if order_id is None and user_id is not None:
+        if session.exec(_user_orders_statement(user_id).limit(1)).first() is None:
+            raise _user_without_orders(user_id)
+    return _items_statement(order_id, user_id, item_id, skip, limit, columns, cursor)
+
+def get_items_ordered(session: Session, order_id: int = None, user_id: int = None, item_id: int = None, skip: int = 0, limit: int = 100, cursor: str = None):
+    items = session.exec(_items_statement(order_id, user_id, item_id, skip, limit, cursor=cursor)).all()
+    # Solo sin resultados hace falta comprobar si el usuario tiene pedidos
+    if not items and order_id is None and user_id is not None:
+        if session.exec(_user_orders_statement(user_id).limit(1)).first() is None:
+            raise _user_without_orders(user_id)
+    return items
+
+async def get_items_ordered_async(session: AsyncSession, order_id: int = None, user_id: int = None, item_id: int = None, skip: int = 0, limit: int = 100, cursor: str = None):
+    items = (await session.exec(_items_statement(order_id, user_id, item_id, skip, limit, cursor=cursor))).all()
+    if not items and order_id is None and user_id is not None:
+        if (await session.exec(_user_orders_statement(user_id).limit(1))).first() is None:
+            raise _user_without_orders(user_id)
     return items
 
 def modify_item_quantity(session: Session, item_id: int, order_id: int, new_quantity: int):
@@ -63,29 +232,45 @@ def modify_item_quantity(session: Session, item_id: int, order_id: int, new_quan
     if not order:
         raise ValueError(f"Order with id {order_id} not found.")
 
-    item = session.exec(
-        select(ItemsOrdered).where(
-        ItemsOrdered.item_id == item_id,
-        ItemsOrdered.order_id == order_id
-        )
-    ).first()
+    item = session.exec(_item_statement(item_id, order_id)).first()
     if not item:
         raise ValueError(f"Item with id {item_id} not found in order {order_id}.")
 
     item.quantity = new_quantity
+    row_id = item.id
     session.commit()
-    session.refresh(item)
-    return item
+    bump_versions("items", order_entity(order_id))
+    return session.execute(_item_read_statement(row_id)).one()
+
+async def modify_item_quantity_async(session: AsyncSession, item_id: int, order_id: int, new_quantity: int):
+    order = await session.get(Order, order_id)
+    if not order:
+        raise ValueError(f"Order with id {order_id} not found.")
+
+    item = (await session.exec(_item_statement(item_id, order_id))).first()
+    if not item:
+        raise ValueError(f"Item with id {item_id} not found in order {order_id}.")
+
+    item.quantity = new_quantity
+    await session.commit()
+    await asyncio.to_thread(bump_versions, "items", order_entity(order_id))
+    return (await session.execute(_item_read_statement(item.id))).one()
 
 def delete_items_ordered(session: Session, item_id: int, order_id: int):
-    item = session.exec(
-        select(ItemsOrdered).where(
-            ItemsOrdered.item_id == item_id,
-            ItemsOrdered.order_id == order_id
-        )
-    ).first()
+    # Se lee la fila completa (con el producto) antes de borrarla para devolverla
+    item = session.execute(_items_statement(order_id=order_id, item_id=item_id)).first()
     if not item:
         raise ValueError(f"Item with id {item_id} not found in order {order_id}.")
-    session.delete(item)
+    session.execute(delete(ItemsOrdered).where(ItemsOrdered.id == item.id))
     session.commit()
-    return item
\ No newline at end of file
+    bump_versions("items", order_entity(order_id))
+    return item
+
+async def delete_items_ordered_async(session: AsyncSession, item_id: int, order_id: int):
+    item = (await session.execute(_items_statement(order_id=order_id, item_id=item_id))).first()
+    if not item:
+        raise ValueError(f"Item with id {item_id} not found in order {order_id}.")
+    await session.execute(delete(ItemsOrdered).where(ItemsOrdered.id == item.id))
+    await session.commit()
+    await asyncio.to_thread(bump_versions, "items", order_entity(order_id))
+    return item
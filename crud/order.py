@@ -1,46 +1,93 @@
+import asyncio
 from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from crud.pagination import paginate
 from models.order import Order
 from models.user import User
+from services.data_versions import bump_versions, order_entity
+
+ORDER_CURSOR_COLUMNS = (Order.created_at, Order.id)
+# Proyección con los campos de OrderRead, para responder sin hidratar entidades
+ORDER_READ_COLUMNS = (Order.owner_id, Order.id, Order.created_at)
+
+def _owner_filters(owner_id: int | None = None, username: str | None = None, email: str | None = None):
+    """Condiciones sobre User que identifican al propietario; username/email tienen prioridad sobre owner_id."""
+    filters = []
+    if username is not None:
+        filters.append(User.username == username)
+    if email is not None:
+        filters.append(User.email == email)
+    if not filters and owner_id is not None:
+        filters.append(User.id == owner_id)
+    return filters
+
+def _owner_exists_statement(owner_filters: list):
+    return select(User.id).where(*owner_filters).limit(1)
+
+def _owner_not_found_message(owner_id: int | None, username: str | None, email: str | None):
+    if username is not None or email is not None:
+        return "No user found with the provided username or email."
+    return f"No user found with id {owner_id}."
+
+def _orders_statement(owner_filters: list, skip: int = 0, limit: int = 100, cursor: str = None, columns: tuple = None):
+    statement = select(*columns) if columns else select(Order)
+    if owner_filters:
+        statement = statement.join(User, Order.owner_id == User.id).where(*owner_filters)
+    return paginate(statement, ORDER_CURSOR_COLUMNS, cursor, skip, limit)
 
 def create_order(session: Session, owner_id: int):
     order = Order(owner_id=owner_id)
     session.add(order)
     session.commit()
+    bump_versions("orders")
     session.refresh(order)
     return order
 
-def get_orders(session: Session, order_id: int | None = None, owner_id: int | None = None, username: str | None = None, email: str | None = None, skip: int = 0, limit: int = 100):
+async def create_order_async(session: AsyncSession, owner_id: int):
+    order = Order(owner_id=owner_id)
+    session.add(order)
+    await session.commit()
+    await asyncio.to_thread(bump_versions, "orders")
+    await session.refresh(order)
+    return order
+
+def get_orders(session: Session, order_id: int | None = None, owner_id: int | None = None, username: str | None = None, email: str | None = None, skip: int = 0, limit: int = 100, cursor: str = None, columns: tuple = None):
     if order_id is not None:
-        order = session.get(Order, order_id)
+        if columns:
+            order = session.exec(select(*columns).where(Order.id == order_id)).first()
+        else:
+            order = session.get(Order, order_id)
         if not order:
             raise ValueError(f"Order with id {order_id} does not exist.")
         return [order]
 
-    user_ids = []
-    if username is not None or email is not None:
-        user_statement = select(User.id)
-        if username is not None:
-            user_statement = user_statement.where(User.username == username)
-        if email is not None:
-            user_statement = user_statement.where(User.email == email)
-        user_ids = session.exec(user_statement).all()
-        if not user_ids:
-            raise ValueError("No user found with the provided username or email.")
-    elif owner_id is not None:
-        user = session.get(User, owner_id)
-        if not user:
-            raise ValueError(f"No user found with id {owner_id}.")
-        user_ids = [owner_id]
-
-    if user_ids:
-        statement = select(Order).where(Order.owner_id.in_(user_ids))
-    else:
-        statement = select(Order)
-
-    statement = statement.offset(skip).limit(limit)
-    orders = session.exec(statement).all()
-
-    if (owner_id is not None or username is not None or email is not None) and not orders:
+    owner_filters = _owner_filters(owner_id, username, email)
+    orders = session.exec(_orders_statement(owner_filters, skip, limit, cursor, columns)).all()
+
+    # Sin resultados: una consulta mínima distingue usuario inexistente de usuario sin pedidos
+    if owner_filters and not orders:
+        if session.exec(_owner_exists_statement(owner_filters)).first() is None:
+            raise ValueError(_owner_not_found_message(owner_id, username, email))
+        raise ValueError("No orders found for the specified user.")
+
+    return orders
+
+async def get_orders_async(session: AsyncSession, order_id: int | None = None, owner_id: int | None = None, username: str | None = None, email: str | None = None, skip: int = 0, limit: int = 100, cursor: str = None, columns: tuple = None):
+    if order_id is not None:
+        if columns:
+            order = (await session.exec(select(*columns).where(Order.id == order_id))).first()
+        else:
+            order = await session.get(Order, order_id)
+        if not order:
+            raise ValueError(f"Order with id {order_id} does not exist.")
+        return [order]
+
+    owner_filters = _owner_filters(owner_id, username, email)
+    orders = (await session.exec(_orders_statement(owner_filters, skip, limit, cursor, columns))).all()
+
+    if owner_filters and not orders:
+        if (await session.exec(_owner_exists_statement(owner_filters))).first() is None:
+            raise ValueError(_owner_not_found_message(owner_id, username, email))
         raise ValueError("No orders found for the specified user.")
 
     return orders
@@ -52,13 +99,35 @@ def update_order(session: Session, order_id: int, order_data: dict):
     for key, value in order_data.items():
         setattr(existing_order, key, value)
     session.commit()
+    bump_versions("orders", "items", order_entity(order_id))
     session.refresh(existing_order)
     return existing_order
 
+async def update_order_async(session: AsyncSession, order_id: int, order_data: dict):
+    existing_order = await session.get(Order, order_id)
+    if not existing_order:
+        return None
+    for key, value in order_data.items():
+        setattr(existing_order, key, value)
+    await session.commit()
+    await asyncio.to_thread(bump_versions, "orders", "items", order_entity(order_id))
+    await session.refresh(existing_order)
+    return existing_order
+
 def delete_order(session: Session, order_id: int):
     existing_order = session.get(Order, order_id)
     if not existing_order:
         raise ValueError(f"Order with id {order_id} does not exist.")
     session.delete(existing_order)
     session.commit()
+    bump_versions("orders", "items", order_entity(order_id))
+    return existing_order
+
+async def delete_order_async(session: AsyncSession, order_id: int):
+    existing_order = await session.get(Order, order_id)
+    if not existing_order:
+        raise ValueError(f"Order with id {order_id} does not exist.")
+    await session.delete(existing_order)
+    await session.commit()
+    await asyncio.to_thread(bump_versions, "orders", "items", order_entity(order_id))
     return existing_order
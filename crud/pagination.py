@@ -0,0 +1,70 @@
+import base64
+import datetime
+import json
+from sqlalchemy import tuple_
+
+# Paginación por cursor (keyset): en lugar de OFFSET, cada página continúa
+# desde los valores de la última fila de la anterior, usando el índice.
+
+class InvalidCursorError(ValueError):
+    pass
+
+def _encode_value(value):
+    if isinstance(value, datetime.datetime):
+        return {"dt": value.isoformat()}
+    return value
+
+def _decode_value(value):
+    if isinstance(value, dict):
+        return datetime.datetime.fromisoformat(value["dt"])
+    return value
+
+def encode_cursor(values) -> str:
+    data = json.dumps([_encode_value(value) for value in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(data.encode("utf-8")).decode("ascii").rstrip("=")
+
+def _matches_column(value, column) -> bool:
+    try:
+        expected = column.type.python_type
+    except NotImplementedError:
+        return True
+    if not isinstance(value, expected):
+        return False
+    if isinstance(value, datetime.datetime):
+        # asyncpg no compara una fecha con zona horaria con una columna sin ella (ni al revés)
+        return (value.tzinfo is not None) == bool(getattr(column.type, "timezone", False))
+    # bool es subclase de int, pero nunca es un valor válido de una columna entera
+    return not (expected is int and isinstance(value, bool))
+
+def decode_cursor(cursor: str, columns: tuple) -> list:
+    """Valores del cursor, validados contra el número y el tipo de las columnas de búsqueda."""
+    try:
+        data = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = [_decode_value(value) for value in json.loads(data)]
+    except (ValueError, TypeError, KeyError):
+        raise InvalidCursorError("Invalid pagination cursor.")
+    if len(values) != len(columns) or not all(map(_matches_column, values, columns)):
+        raise InvalidCursorError("Invalid pagination cursor.")
+    return values
+
+def paginate(statement, columns: tuple, cursor: str | None = None, skip: int = 0, limit: int = 100):
+    """
+    Ordena por `columns` y aplica la página: con `cursor` se busca a partir de la
+    última fila vista (`columns > cursor`); sin él se mantiene el modo OFFSET.
+    """
+    statement = statement.order_by(*columns)
+    if cursor is None:
+        return statement.offset(skip).limit(limit)
+    values = decode_cursor(cursor, columns)
+    if len(columns) == 1:
+        statement = statement.where(columns[0] > values[0])
+    else:
+        statement = statement.where(tuple_(*columns) > tuple_(*values))
+    return statement.limit(limit)
+
+def next_cursor(rows, columns: tuple, limit: int) -> str | None:
+    """Cursor de la página siguiente, o None si esta página es la última."""
+    if not rows or len(rows) < limit:
+        return None
+    last = rows[-1]
+    return encode_cursor([getattr(last, column.key) for column in columns])
@@ -1,117 +1,143 @@
-import pandas as pd
-from io import BytesIO
-from fastapi.responses import Response
-from jinja2 import Template
+import csv
+import os
+import tempfile
+import xlsxwriter
+from io import BytesIO, StringIO
+from fastapi.responses import FileResponse, Response, StreamingResponse
+from starlette.background import BackgroundTask
+from sqlmodel import Session
 from xhtml2pdf import pisa
-from pathlib import Path
-from crud.items_ordered import get_items_ordered
+from crud.report_data import REPORT_HEADER, iter_report_rows, report_statement, report_totals
+from db.database import engine
+from services.templating import env
+
+# Tamaño de cada trozo enviado en los informes en streaming
+REPORT_STREAM_CHUNK = 64 * 1024
+# Directorio para los ficheros temporales de los informes (por defecto el del sistema)
+REPORT_TMP_DIR = os.getenv("REPORT_TMP_DIR") or None
+
+# Los writers reciben las filas (tuplas en el orden de REPORT_HEADER) y una función
+# que devuelve los totales calculados en SQL, que se pide después de recorrer las filas.
+
+def _footer_rows(totals, grand_total):
+    for order_id, category, quantity, total_price in totals:
+        yield [order_id, "", "Subtotal", "", category, total_price, "", "", quantity]
+    yield ["", "", "Total", "", "", grand_total, "", "", ""]
+
+def _csv_chunks(rows, get_totals):
+    buffer = StringIO()
+    writer = csv.writer(buffer)
+
+    def flush():
+        data = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+        return data
+
+    writer.writerow(REPORT_HEADER)
+    for row in rows:
+        writer.writerow(row)
+        if buffer.tell() >= REPORT_STREAM_CHUNK:
+            yield flush()
+    writer.writerows(_footer_rows(*get_totals()))
+    yield flush()
+
+def _write_csv(rows, get_totals, path: str):
+    with open(path, "w", newline="", encoding="utf-8") as file:
+        for chunk in _csv_chunks(rows, get_totals):
+            file.write(chunk)
+
+def _write_excel(rows, get_totals, path: str):
+    workbook = xlsxwriter.Workbook(path, {"constant_memory": True})
+    worksheet = workbook.add_worksheet("Items Ordered")
+    header_format = workbook.add_format({"bold": True, "border": 1})
+    worksheet.write_row(0, 0, REPORT_HEADER, header_format)
+
+    row_number = 0
+    for row_number, row in enumerate(rows, start=1):
+        worksheet.write_row(row_number, 0, row)
+    for row_number, row in enumerate(_footer_rows(*get_totals()), start=row_number + 1):
+        worksheet.write_row(row_number, 0, row)
+    workbook.close()
+
+def _render_pdf(rows, get_totals, dest) -> bool:
+    items = list(rows)
+    totals, total_price = get_totals()
+    template = env.get_template("order_template.html")
+    rendered_html = template.render(items=items, totals=totals, total_price=total_price)
+    pisa_status = pisa.CreatePDF(rendered_html, dest=dest)
+    return not pisa_status.err
+
+def _write_pdf(rows, get_totals, path: str):
+    with open(path, "wb") as file:
+        if not _render_pdf(rows, get_totals, file):
+            raise RuntimeError("Error al generar el PDF")
+
+# Formatos disponibles: función que escribe el fichero, tipo MIME y extensión
+REPORT_FORMATS = {
+    "excel": (_write_excel, "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", "xlsx"),
+    "csv": (_write_csv, "text/csv", "csv"),
+    "pdf": (_write_pdf, "application/pdf", "pdf"),
+}
+
+def _report_source(session, statement):
+    return iter_report_rows(session, statement), lambda: report_totals(session, statement)
+
+def write_report(report_format: str, session, statement, path: str):
+    writer, _, _ = REPORT_FORMATS[report_format]
+    writer(*_report_source(session, statement), path)
+
+def _csv_stream(statement):
+    # Sesión propia: la de la dependencia se cierra antes de enviar la respuesta
+    with Session(engine) as session:
+        yield from _csv_chunks(*_report_source(session, statement))
 
 def generate_excel_report(session, order_id=None, user_id=None, item_id=None, skip=0, limit=100):
-    items = get_items_ordered(session, order_id=order_id, user_id=user_id, item_id=item_id, skip=skip, limit=limit)
-    total_price = round(sum(item.price for item in items), 2)
-
-    
-    buffer = BytesIO()
-    data = [{
-        "Order ID": item.order_id,
-        "Item ID": item.item_id,
-        "Item Title": item.title,
-        "Item Description": item.description,
-        "Item Category": item.category,
-        "Item Price": item.price,
-        "Item Rating": item.rating,
-        "Item Brand": item.brand,
-        "Item Quantity": item.quantity
-    } for item in items]
-
-    data.append({
-            "Order ID": "",
-            "Item ID": "",
-            "Item Title": "",
-            "Item Description": "",
-            "Item Category": "",
-            "Item Price": total_price,
-            "Item Rating": "",
-            "Item Brand": "",
-            "Item Quantity": ""
-    })
-
-    df = pd.DataFrame(data)
-    with pd.ExcelWriter(buffer, engine="xlsxwriter") as writer:
-        df.to_excel(writer, index=False, sheet_name="Items Ordered")
-    buffer.seek(0)
-    return Response(
-        buffer.getvalue(),
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers={"Content-Disposition": "attachment; filename=items_ordered.xlsx"}
+    """
+    Excel escrito con xlsxwriter en modo constant_memory directamente desde el cursor
+    a un fichero temporal, que se envía en streaming y se borra al terminar.
+    """
+    statement = report_statement(session, order_id=order_id, user_id=user_id, item_id=item_id, skip=skip, limit=limit)
+    fd, path = tempfile.mkstemp(suffix=".xlsx", dir=REPORT_TMP_DIR)
+    os.close(fd)
+    try:
+        write_report("excel", session, statement, path)
+    except Exception:
+        os.remove(path)
+        raise
+    return FileResponse(
+        path,
+        media_type=REPORT_FORMATS["excel"][1],
+        filename="items_ordered.xlsx",
+        background=BackgroundTask(os.remove, path)
     )
 
 def generate_csv_report(session, order_id=None, user_id=None, item_id=None, skip=0, limit=100):
-    items = get_items_ordered(session, order_id=order_id, user_id=user_id, item_id=item_id, skip=skip, limit=limit)
-    total_price = round(sum(item.price for item in items), 2)
-
-    
-    buffer = BytesIO()
-    data = [{
-        "Order ID": item.order_id,
-        "Item ID": item.item_id,
-        "Item Title": item.title,
-        "Item Description": item.description,
-        "Item Category": item.category,
-        "Item Price": item.price,
-        "Item Rating": item.rating,
-        "Item Brand": item.brand,
-        "Item Quantity": item.quantity
-    } for item in items]
-
-    data.append({
-        "Order ID": "",
-        "Item ID": "",
-        "Item Title": "",
-        "Item Description": "",
-        "Item Category": "",
-        "Item Price": total_price,
-        "Item Rating": "",
-        "Item Brand": "",
-        "Item Quantity": ""
-    })
-
-    df = pd.DataFrame(data)
-    df.to_csv(buffer, index=False)
-    buffer.seek(0)
+    statement = report_statement(session, order_id=order_id, user_id=user_id, item_id=item_id, skip=skip, limit=limit)
     return Response(
-        buffer.getvalue(),
+        "".join(_csv_chunks(*_report_source(session, statement))),
         media_type="text/csv",
         headers={"Content-Disposition": "attachment; filename=items_ordered.csv"}
     )
 
-def generate_pdf_report(session, order_id=None, user_id=None, item_id=None, skip=0, limit=100):
-    items = get_items_ordered(session, order_id=order_id, user_id=user_id, item_id=item_id, skip=skip, limit=limit)
-    total_price = round(sum(item.price for item in items), 2)
-    
-    template_path = Path("templates/order_template.html")
-    html_template = template_path.read_text(encoding="utf-8")
-    template = Template(html_template)
-    rendered_html = template.render(items=[{
-        "order_id": item.order_id,
-        "item_id": item.item_id,
-        "title": item.title,
-        "description": item.description,
-        "category": item.category,
-        "price": item.price,
-        "rating": item.rating,
-        "brand": item.brand,
-        "quantity": item.quantity
-    } for item in items], total_price=total_price)
+def stream_csv_report(session, order_id=None, user_id=None, item_id=None, skip=0, limit=100):
+    """CSV generado fila a fila desde un cursor de servidor: la memoria no crece con el informe."""
+    statement = report_statement(session, order_id=order_id, user_id=user_id, item_id=item_id, skip=skip, limit=limit)
+    return StreamingResponse(
+        _csv_stream(statement),
+        media_type="text/csv",
+        headers={"Content-Disposition": "attachment; filename=items_ordered.csv"}
+    )
 
+def generate_pdf_report(session, order_id=None, user_id=None, item_id=None, skip=0, limit=100):
+    statement = report_statement(session, order_id=order_id, user_id=user_id, item_id=item_id, skip=skip, limit=limit)
     pdf_buffer = BytesIO()
-    pisa_status = pisa.CreatePDF(rendered_html, dest=pdf_buffer)
-    if pisa_status.err:
+    if not _render_pdf(*_report_source(session, statement), pdf_buffer):
         return {"error": "Error al generar el PDF"}
     pdf_buffer.seek(0)
-    
+
     return Response(
         pdf_buffer.getvalue(),
         media_type="application/pdf",
         headers={"Content-Disposition": "attachment; filename=items_ordered.pdf"}
-    )
\ No newline at end of file
+    )
@@ -0,0 +1,56 @@
+import os
+from sqlalchemy import func
+from sqlmodel import Session, select
+from crud.items_ordered import items_ordered_statement
+from models.items_ordered import ItemsOrdered
+from models.product import Product
+
+# Filas leídas por lote del cursor de servidor
+REPORT_STREAM_BATCH = int(os.getenv("REPORT_STREAM_BATCH", 1000))
+
+# Columnas del informe, en el mismo orden que REPORT_HEADER (los datos del producto vienen de su versión)
+REPORT_COLUMNS = (
+    ItemsOrdered.order_id,
+    ItemsOrdered.item_id,
+    Product.title,
+    Product.description,
+    Product.category,
+    ItemsOrdered.price,
+    Product.rating,
+    Product.brand,
+    ItemsOrdered.quantity,
+)
+
+REPORT_HEADER = [
+    "Order ID", "Item ID", "Item Title", "Item Description", "Item Category",
+    "Item Price", "Item Rating", "Item Brand", "Item Quantity"
+]
+
+def report_statement(session: Session, order_id=None, user_id=None, item_id=None, skip=0, limit=100):
+    """Proyección de columnas con los filtros del informe: sin hidratar entidades ORM."""
+    return items_ordered_statement(
+        session, order_id=order_id, user_id=user_id, item_id=item_id, skip=skip, limit=limit,
+        columns=REPORT_COLUMNS
+    )
+
+def iter_report_rows(session: Session, statement):
+    """Filas del informe como tuplas, leídas por lotes con un cursor de servidor."""
+    return session.execute(statement.execution_options(yield_per=REPORT_STREAM_BATCH))
+
+def report_totals(session: Session, statement) -> tuple[list, float]:
+    """
+    Subtotales por pedido y categoría (precio * cantidad) calculados en SQL
+    sobre las mismas filas del informe, y el total general.
+    """
+    rows = statement.subquery()
+    totals_statement = select(
+        rows.c.order_id,
+        rows.c.category,
+        func.sum(rows.c.quantity).label("quantity"),
+        func.sum(rows.c.price * rows.c.quantity).label("total_price"),
+    ).group_by(rows.c.order_id, rows.c.category).order_by(rows.c.order_id, rows.c.category)
+    totals = [
+        (order_id, category, quantity, round(total_price or 0.0, 2))
+        for order_id, category, quantity, total_price in session.execute(totals_statement)
+    ]
+    return totals, round(sum(total[3] for total in totals), 2)
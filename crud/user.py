@@ -1,14 +1,40 @@
+import asyncio
 from pydantic import EmailStr
 from sqlmodel import Session, select
-from auth.hashing import hash_password
+from sqlmodel.ext.asyncio.session import AsyncSession
+from auth.hashing import hash_password, hash_password_async
+from auth.principal_cache import invalidate_principal
+from crud.pagination import paginate
 from models.user import User, UserCreate
+from services.data_versions import bump_versions
+
+USER_CURSOR_COLUMNS = (User.id,)
+# Proyección con los campos de UserRead (más id para el cursor), sin hidratar entidades
+USER_READ_COLUMNS = (User.id, User.username, User.email, User.role)
+
+def _existing_user_statement(username: str, email: EmailStr):
+    return select(User).where(
+        (User.username == username) | (User.email == email)
+    )
+
+def _users_statement(id: int = None, username: str = None, email: str = None, skip: int = 0, limit: int = 100, cursor: str = None, columns: tuple = None):
+    statement = select(*columns) if columns else select(User)
+    if id is not None:
+        statement = statement.where(User.id == id)
+    if username is not None:
+        statement = statement.where(User.username == username)
+    if email is not None:
+        statement = statement.where(User.email == email)
+    return paginate(statement, USER_CURSOR_COLUMNS, cursor, skip, limit)
+
+def _apply_user_data(existing_user: User, user_data: UserCreate, hashed_password: str | None):
+    for key, value in user_data.model_dump(exclude={"id", "password"}).items():
+        setattr(existing_user, key, value)
+    if hashed_password:
+        existing_user.hashed_password = hashed_password
 
 def create_user(session: Session, username: str, email: EmailStr, password: str, role: str = "client"):
-    existing_user = session.exec(
-        select(User).where(
-            (User.username == username) | (User.email == email)
-        )
-    ).first()
+    existing_user = session.exec(_existing_user_statement(username, email)).first()
     if existing_user:
         raise ValueError(f"A user with username '{username}' or email '{email}' already exists.")
     hashed_password = hash_password(password)
@@ -17,37 +43,78 @@ def create_user(session: Session, username: str, email: EmailStr, password: str,
         raise ValueError("Username, email, and password are required fields.")
     session.add(user_data)
     session.commit()
+    bump_versions("users")
     session.refresh(user_data)
     return user_data
 
-def get_users(session: Session, id: int = None, username: str = None, email: str = None, skip: int = 0, limit: int = 100):
-    statement = select(User)
-    if id is not None:
-        statement = statement.where(User.id == id)
-    if username is not None:
-        statement = statement.where(User.username == username)
-    if email is not None:
-        statement = statement.where(User.email == email)
-    statement = statement.offset(skip).limit(limit)
-    users = session.exec(statement).all()
+async def create_user_async(session: AsyncSession, username: str, email: EmailStr, password: str, role: str = "client"):
+    existing_user = (await session.exec(_existing_user_statement(username, email))).first()
+    if existing_user:
+        raise ValueError(f"A user with username '{username}' or email '{email}' already exists.")
+    hashed_password = await hash_password_async(password)
+    user_data = User(username=username, email=email, hashed_password=hashed_password, role=role)
+    if not user_data.username or not user_data.email or not user_data.hashed_password:
+        raise ValueError("Username, email, and password are required fields.")
+    session.add(user_data)
+    await session.commit()
+    await asyncio.to_thread(bump_versions, "users")
+    await session.refresh(user_data)
+    return user_data
+
+def get_users(session: Session, id: int = None, username: str = None, email: str = None, skip: int = 0, limit: int = 100, cursor: str = None, columns: tuple = None):
+    users = session.exec(_users_statement(id, username, email, skip, limit, cursor, columns)).all()
+    return users
+
+async def get_users_async(session: AsyncSession, id: int = None, username: str = None, email: str = None, skip: int = 0, limit: int = 100, cursor: str = None, columns: tuple = None):
+    users = (await session.exec(_users_statement(id, username, email, skip, limit, cursor, columns))).all()
     return users
 
 def update_user(session: Session, user_id: int, user_data: UserCreate):
     existing_user = session.get(User, user_id)
     if not existing_user:
         return None
-    for key, value in user_data.model_dump(exclude={"id", "password"}).items():
-        setattr(existing_user, key, value)
-    if user_data.password:
-        existing_user.hashed_password = hash_password(user_data.password)
+    previous_username = existing_user.username
+    hashed_password = hash_password(user_data.password) if user_data.password else None
+    _apply_user_data(existing_user, user_data, hashed_password)
     session.commit()
+    bump_versions("users")
     session.refresh(existing_user)
+    invalidate_principal(previous_username, existing_user.username)
+    return existing_user
+
+async def update_user_async(session: AsyncSession, user_id: int, user_data: UserCreate):
+    existing_user = await session.get(User, user_id)
+    if not existing_user:
+        return None
+    previous_username = existing_user.username
+    hashed_password = await hash_password_async(user_data.password) if user_data.password else None
+    _apply_user_data(existing_user, user_data, hashed_password)
+    await session.commit()
+    await asyncio.to_thread(bump_versions, "users")
+    await session.refresh(existing_user)
+    await asyncio.to_thread(invalidate_principal, previous_username, existing_user.username)
     return existing_user
 
 def delete_user(session: Session, user_id: int):
     existing_user = session.get(User, user_id)
     if not existing_user:
         return None
+    username = existing_user.username
     session.delete(existing_user)
     session.commit()
-    return existing_user
\ No newline at end of file
+    invalidate_principal(username)
+    # El borrado en cascada alcanza a sus pedidos y sus ítems
+    bump_versions("users", "orders", "items")
+    return existing_user
+
+async def delete_user_async(session: AsyncSession, user_id: int):
+    existing_user = await session.get(User, user_id)
+    if not existing_user:
+        return None
+    username = existing_user.username
+    await session.delete(existing_user)
+    await session.commit()
+    await asyncio.to_thread(invalidate_principal, username)
+    # El borrado en cascada alcanza a sus pedidos y sus ítems
+    await asyncio.to_thread(bump_versions, "users", "orders", "items")
+    return existing_user
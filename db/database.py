@@ -1,9 +1,19 @@
 import os
+from pathlib import Path
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import inspect, text
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
 from sqlmodel import SQLModel, create_engine, Session
-from dotenv import load_dotenv
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-# Load environment variables from .env file
-load_dotenv()
+from services.instrumentation import register_db_timing
+from services.query_detector import QUERY_DETECTOR, register_query_detector
+from db.pool import (
+    InstrumentedAsyncQueuePool, InstrumentedQueuePool,
+    async_pool_metrics, register_pool_events, sync_pool_metrics
+)
 
 # Construct DATABASE_URL from individual environment variables
 DB_USER = os.getenv("DB_USER")
@@ -13,12 +23,74 @@ DB_PORT = os.getenv("DB_PORT")
 DB_NAME = os.getenv("DB_NAME")
 
 DATABASE_URL = f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+ASYNC_DATABASE_URL = f"postgresql+asyncpg://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
 
-engine = create_engine(DATABASE_URL, echo=False)
+# Configuración del pool de conexiones
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 5))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 10))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 30))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 1800))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "yes").lower() == "yes"
+# Con PgBouncer el pool lo gestiona PgBouncer: sin pool local ni sentencias preparadas
+DB_PGBOUNCER = os.getenv("DB_PGBOUNCER", "no").lower() == "yes"
+
+def _engine_options(pool_class):
+    if DB_PGBOUNCER:
+        return {"poolclass": NullPool}
+    return {
+        "poolclass": pool_class,
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
+
+engine = create_engine(DATABASE_URL, echo=False, **_engine_options(InstrumentedQueuePool))
+# Motor asíncrono para las rutas async (no bloquea el event loop)
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    echo=False,
+    connect_args={"statement_cache_size": 0, "prepared_statement_cache_size": 0} if DB_PGBOUNCER else {},
+    **_engine_options(InstrumentedAsyncQueuePool)
+)
+
+register_pool_events(engine, sync_pool_metrics)
+register_pool_events(async_engine.sync_engine, async_pool_metrics)
+register_db_timing(engine)
+register_db_timing(async_engine.sync_engine)
+# Detector de N+1, consultas lentas y presupuestos por ruta (solo en tests y staging)
+if QUERY_DETECTOR != "off":
+    register_query_detector(engine)
+    register_query_detector(async_engine.sync_engine)
+
+def get_pool_stats():
+    return [
+        sync_pool_metrics.snapshot(engine.pool),
+        async_pool_metrics.snapshot(async_engine.sync_engine.pool),
+    ]
+
+# Migraciones del esquema (Alembic)
+ALEMBIC_CONFIG = Path(__file__).resolve().parent.parent / "alembic.ini"
+# Revisión equivalente al esquema que creaba SQLModel.metadata.create_all
+BASELINE_REVISION = "0001"
+
+def alembic_config(connection=None) -> Config:
+    config = Config(str(ALEMBIC_CONFIG))
+    config.set_main_option("script_location", str(ALEMBIC_CONFIG.parent / "migrations"))
+    config.attributes["connection"] = connection
+    config.attributes["configure_logger"] = False
+    return config
 
 def create_db_and_tables():
+    """Aplica las migraciones pendientes; las bases creadas con create_all se marcan antes en la revisión inicial."""
     try:
-        SQLModel.metadata.create_all(engine)
+        with engine.begin() as connection:
+            config = alembic_config(connection)
+            tables = inspect(connection).get_table_names()
+            if "alembic_version" not in tables and "user" in tables:
+                command.stamp(config, BASELINE_REVISION)
+            command.upgrade(config, "head")
         print("✅ Tables created successfully.")
     except Exception as e:
         print(f"Error creating tables: {e}")
@@ -31,6 +103,9 @@ def drop_db_and_tables():
     
     try:
         SQLModel.metadata.drop_all(engine)
+        # Sin las tablas, la versión de Alembic también se borra para volver a migrar desde cero
+        with engine.begin() as connection:
+            connection.execute(text("DROP TABLE IF EXISTS alembic_version"))
         print("✅ Tables dropped successfully.")
     except Exception as e:
         print(f"Error dropping tables: {e}")
@@ -39,3 +114,8 @@ def get_session():
     with Session(engine) as session:
         yield session
 
+async def get_async_session():
+    # expire_on_commit=False evita cargas implícitas (no permitidas en async) tras el commit
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
+        yield session
+
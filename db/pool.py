@@ -0,0 +1,106 @@
+import threading
+import time
+
+from sqlalchemy import event, exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+
+class PoolMetrics:
+    """Contadores del pool de conexiones alimentados por los eventos del pool."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timed_checkouts = 0
+        self.checkins = 0
+        self.connects = 0
+        self.invalidations = 0
+        self.overflow_checkouts = 0
+        self.timeouts = 0
+        self.checkout_seconds_total = 0.0
+        self.checkout_seconds_max = 0.0
+
+    def record_checkout(self, elapsed: float, overflow: bool):
+        with self._lock:
+            self.timed_checkouts += 1
+            self.checkout_seconds_total += elapsed
+            self.checkout_seconds_max = max(self.checkout_seconds_max, elapsed)
+            if overflow:
+                self.overflow_checkouts += 1
+
+    def record_timeout(self):
+        with self._lock:
+            self.timeouts += 1
+
+    def snapshot(self, pool) -> dict:
+        with self._lock:
+            data = {
+                "pool": self.name,
+                "pool_class": type(pool).__name__,
+                "checkouts": self.checkouts,
+                "checkins": self.checkins,
+                "connects": self.connects,
+                "invalidations": self.invalidations,
+                "overflow_checkouts": self.overflow_checkouts,
+                "timeouts": self.timeouts,
+                "checkout_seconds_total": round(self.checkout_seconds_total, 6),
+                "checkout_seconds_max": round(self.checkout_seconds_max, 6),
+                "checkout_seconds_avg": round(self.checkout_seconds_total / self.timed_checkouts, 6) if self.timed_checkouts else 0.0,
+            }
+        if isinstance(pool, QueuePool):
+            data.update({
+                "size": pool.size(),
+                "checked_out": pool.checkedout(),
+                "checked_in": pool.checkedin(),
+                "overflow": max(pool.overflow(), 0),
+            })
+        return data
+
+
+sync_pool_metrics = PoolMetrics("sync")
+async_pool_metrics = PoolMetrics("async")
+
+
+def instrumented_pool_class(base: type[QueuePool], metrics: PoolMetrics) -> type[QueuePool]:
+    """Subclase del pool que mide el tiempo de espera para obtener una conexión."""
+
+    class InstrumentedPool(base):
+        def _do_get(self):
+            start = time.perf_counter()
+            try:
+                connection = super()._do_get()
+            except exc.TimeoutError:
+                metrics.record_timeout()
+                raise
+            metrics.record_checkout(time.perf_counter() - start, self.overflow() > 0)
+            return connection
+
+    InstrumentedPool.__name__ = f"Instrumented{base.__name__}"
+    return InstrumentedPool
+
+
+InstrumentedQueuePool = instrumented_pool_class(QueuePool, sync_pool_metrics)
+InstrumentedAsyncQueuePool = instrumented_pool_class(AsyncAdaptedQueuePool, async_pool_metrics)
+
+
+def register_pool_events(engine, metrics: PoolMetrics):
+    @event.listens_for(engine, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        with metrics._lock:
+            metrics.connects += 1
+
+    @event.listens_for(engine, "checkout")
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        with metrics._lock:
+            metrics.checkouts += 1
+
+    @event.listens_for(engine, "checkin")
+    def on_checkin(dbapi_connection, connection_record):
+        with metrics._lock:
+            metrics.checkins += 1
+
+    @event.listens_for(engine, "invalidate")
+    def on_invalidate(dbapi_connection, connection_record, exception):
+        with metrics._lock:
+            metrics.invalidations += 1
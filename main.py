@@ -1,22 +1,47 @@
-from dotenv import load_dotenv
+import settings  # noqa: F401  (carga .env antes que el resto de módulos)
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException, Request
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi.responses import HTMLResponse, JSONResponse, ORJSONResponse
 from fastapi.security import OAuth2PasswordBearer
-from fastapi.templating import Jinja2Templates
-from sqlmodel import SQLModel
-from db.database import engine
+from auth.hashing import HashingBusyError
+from auth.revocation import revocation_filter
+from crud.pagination import InvalidCursorError
+from db.database import create_db_and_tables
 import uvicorn
-from routes import auth, user, order, items_ordered, report
+from routes import auth, user, order, items_ordered, report, monitoring
+from services.http_client import start_http_client, close_http_client
+from services.instrumentation import InstrumentationMiddleware
+from services.profiler import PROFILE_TOKEN, ProfileRequestMiddleware
+from services.query_detector import QUERY_DETECTOR, QueryDetectorMiddleware
+from services.report_jobs import start_report_workers, stop_report_workers
+from services.templating import precompile_templates, templates
 
-# Load environment variables from .env file
-load_dotenv()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    precompile_templates()
+    # Cliente HTTP compartido para la API de productos
+    await start_http_client()
+    # Filtro local de tokens revocados, sincronizado con Redis en segundo plano
+    revocation_filter.start()
+    # Pool de procesos para generar informes en segundo plano
+    start_report_workers()
+    yield
+    stop_report_workers()
+    revocation_filter.stop()
+    await close_http_client()
 
-app = FastAPI()
+# orjson para serializar las respuestas JSON (bastante más rápido que json de la stdlib)
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
 
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
+# Server-Timing y métricas por ruta (/metrics)
+app.add_middleware(InstrumentationMiddleware)
+if QUERY_DETECTOR != "off":
+    app.add_middleware(QueryDetectorMiddleware)
+# Perfil de muestreo de las peticiones con la cabecera X-Profile-Token
+if PROFILE_TOKEN:
+    app.add_middleware(ProfileRequestMiddleware)
 
-# Configuración de Jinja2
-templates = Jinja2Templates(directory="templates")
+oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
 
 @app.get("/", response_class=HTMLResponse)
 def read_root(request: Request):
@@ -28,6 +53,8 @@ app.include_router(user.router, prefix="/api", tags=["Users"])
 app.include_router(order.router, prefix="/api", tags=["Orders"])
 app.include_router(items_ordered.router, prefix="/api", tags=["Items Ordered"])
 app.include_router(report.router, prefix="/api", tags=["Report"])
+app.include_router(monitoring.router, prefix="/api", tags=["Monitoring"])
+app.include_router(monitoring.metrics_router)
 
 # Manejo de excepciones para errores de cliente (4xx)
 @app.exception_handler(HTTPException)
@@ -37,6 +64,23 @@ async def http_exception_handler(request: Request, exc: HTTPException):
         content={"detail": exc.detail},
     )
 
+# Pool de hashing saturado: pedir al cliente que reintente
+@app.exception_handler(HashingBusyError)
+async def hashing_busy_handler(request: Request, exc: HashingBusyError):
+    return JSONResponse(
+        status_code=429,
+        content={"detail": str(exc)},
+        headers={"Retry-After": "1"},
+    )
+
+# Cursor de paginación mal formado o manipulado
+@app.exception_handler(InvalidCursorError)
+async def invalid_cursor_handler(request: Request, exc: InvalidCursorError):
+    return JSONResponse(
+        status_code=400,
+        content={"detail": str(exc)},
+    )
+
 # Manejo de excepciones globales para errores del servidor (5xx)
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
@@ -46,7 +90,7 @@ async def global_exception_handler(request: Request, exc: Exception):
     )
 
 def init_db():
-    SQLModel.metadata.create_all(engine)
+    create_db_and_tables()
 
 if __name__ == "__main__":
     init_db
@@ -0,0 +1,48 @@
+import settings  # noqa: F401  (carga .env antes que el resto de módulos)
+from logging.config import fileConfig
+from alembic import context
+from sqlmodel import SQLModel
+from db.database import DATABASE_URL, engine
+# Importar los modelos para registrar sus tablas en los metadatos
+from models import items_ordered, order, product, user  # noqa: F401
+
+config = context.config
+
+if config.config_file_name is not None and config.attributes.get("configure_logger", True):
+    fileConfig(config.config_file_name)
+
+target_metadata = SQLModel.metadata
+
+
+def run_migrations_offline():
+    context.configure(
+        url=DATABASE_URL,
+        target_metadata=target_metadata,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def _run_migrations(connection):
+    context.configure(connection=connection, target_metadata=target_metadata, compare_type=True)
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online():
+    # create_db_and_tables pasa su propia conexión; desde la CLI se usa el motor de la app
+    connection = config.attributes.get("connection")
+    if connection is not None:
+        _run_migrations(connection)
+        return
+    with engine.connect() as connection:
+        _run_migrations(connection)
+        connection.commit()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
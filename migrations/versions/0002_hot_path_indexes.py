@@ -0,0 +1,51 @@
+"""Índices de las rutas de acceso frecuentes de pedidos e ítems
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+ITEMS_UNIQUE = "uq_itemsordered_order_id_item_id"
+ORDERS_OWNER_INDEX = "ix_order_owner_id_created_at"
+
+
+def upgrade():
+    # Las bases creadas con create_all después de añadir la restricción ya la tienen
+    existing = {constraint["name"] for constraint in sa.inspect(op.get_bind()).get_unique_constraints("itemsordered")}
+    if ITEMS_UNIQUE not in existing:
+        # Fusionar posibles duplicados (order_id, item_id) en la fila de menor id antes de crear la restricción
+        op.execute("""
+            UPDATE itemsordered AS keep
+            SET quantity = dup.total_quantity
+            FROM (
+                SELECT MIN(id) AS id, SUM(quantity) AS total_quantity
+                FROM itemsordered
+                GROUP BY order_id, item_id
+                HAVING COUNT(*) > 1
+            ) AS dup
+            WHERE keep.id = dup.id
+        """)
+        op.execute("""
+            DELETE FROM itemsordered AS item
+            USING itemsordered AS keep
+            WHERE item.order_id = keep.order_id
+              AND item.item_id = keep.item_id
+              AND item.id > keep.id
+        """)
+        op.create_unique_constraint(ITEMS_UNIQUE, "itemsordered", ["order_id", "item_id"])
+
+    # Cubre también las búsquedas solo por owner_id (columna inicial del índice)
+    op.create_index(ORDERS_OWNER_INDEX, "order", ["owner_id", "created_at"])
+
+
+def downgrade():
+    op.drop_index(ORDERS_OWNER_INDEX, table_name="order")
+    op.drop_constraint(ITEMS_UNIQUE, "itemsordered", type_="unique")
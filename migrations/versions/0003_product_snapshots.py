@@ -0,0 +1,104 @@
+"""Tabla product con las versiones de los productos; los ítems solo guardan el precio de compra
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18
+"""
+import hashlib
+import json
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+SNAPSHOT_FIELDS = ("title", "description", "category", "price", "rating", "brand")
+
+
+def _content_hash(row) -> str:
+    # Copia de models.product.product_content_hash en el momento de esta migración
+    values = [row[field] for field in SNAPSHOT_FIELDS]
+    values[3], values[4] = float(values[3] or 0.0), float(values[4] or 0.0)
+    return hashlib.sha256(json.dumps(values).encode("utf-8")).hexdigest()
+
+
+def upgrade():
+    op.create_table(
+        "product",
+        sa.Column("item_id", sa.Integer(), nullable=False),
+        sa.Column("version", sa.Integer(), nullable=False),
+        sa.Column("content_hash", sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column("title", sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column("description", sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+        sa.Column("category", sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column("price", sa.Float(), nullable=False),
+        sa.Column("rating", sa.Float(), nullable=False),
+        sa.Column("brand", sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.PrimaryKeyConstraint("item_id", "version"),
+        sa.UniqueConstraint("item_id", "content_hash", name="uq_product_item_id_content_hash"),
+    )
+    op.add_column("itemsordered", sa.Column("product_version", sa.Integer(), nullable=True))
+
+    # Una versión por cada combinación distinta de datos de un producto, en orden de aparición
+    bind = op.get_bind()
+    snapshots = bind.execute(sa.text(f"""
+        SELECT item_id, {", ".join(SNAPSHOT_FIELDS)},
+               ROW_NUMBER() OVER (PARTITION BY item_id ORDER BY MIN(id)) AS version
+        FROM itemsordered
+        GROUP BY item_id, {", ".join(SNAPSHOT_FIELDS)}
+    """)).mappings().all()
+    if snapshots:
+        bind.execute(
+            sa.text(f"""
+                INSERT INTO product (item_id, version, content_hash, {", ".join(SNAPSHOT_FIELDS)})
+                VALUES (:item_id, :version, :content_hash, {", ".join(f":{field}" for field in SNAPSHOT_FIELDS)})
+            """),
+            [{**snapshot, "content_hash": _content_hash(snapshot)} for snapshot in snapshots]
+        )
+
+    op.execute(f"""
+        UPDATE itemsordered AS item
+        SET product_version = product.version
+        FROM product
+        WHERE product.item_id = item.item_id
+          AND {" AND ".join(f"product.{field} IS NOT DISTINCT FROM item.{field}" for field in SNAPSHOT_FIELDS)}
+    """)
+    op.alter_column("itemsordered", "product_version", nullable=False)
+    op.create_foreign_key(
+        "fk_itemsordered_product", "itemsordered", "product",
+        ["item_id", "product_version"], ["item_id", "version"]
+    )
+
+    # La línea conserva solo el precio de compra
+    op.drop_index("ix_itemsordered_title", table_name="itemsordered")
+    for field in ("title", "description", "category", "rating", "brand"):
+        op.drop_column("itemsordered", field)
+
+
+def downgrade():
+    op.add_column("itemsordered", sa.Column("title", sqlmodel.sql.sqltypes.AutoString(), nullable=True))
+    op.add_column("itemsordered", sa.Column("description", sqlmodel.sql.sqltypes.AutoString(), nullable=True))
+    op.add_column("itemsordered", sa.Column("category", sqlmodel.sql.sqltypes.AutoString(), nullable=True))
+    op.add_column("itemsordered", sa.Column("rating", sa.Float(), nullable=True))
+    op.add_column("itemsordered", sa.Column("brand", sqlmodel.sql.sqltypes.AutoString(), nullable=True))
+    op.execute("""
+        UPDATE itemsordered AS item
+        SET title = product.title,
+            description = product.description,
+            category = product.category,
+            rating = product.rating,
+            brand = product.brand
+        FROM product
+        WHERE product.item_id = item.item_id AND product.version = item.product_version
+    """)
+    for field in ("title", "category", "rating", "brand"):
+        op.alter_column("itemsordered", field, nullable=False)
+    op.create_index("ix_itemsordered_title", "itemsordered", ["title"])
+
+    op.drop_constraint("fk_itemsordered_product", "itemsordered", type_="foreignkey")
+    op.drop_column("itemsordered", "product_version")
+    op.drop_table("product")
@@ -0,0 +1,24 @@
+"""Índice para el listado de pedidos sin filtro de propietario (cursor por created_at, id)
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18
+"""
+from alembic import op
+
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+ORDERS_CREATED_AT_INDEX = "ix_order_created_at_id"
+
+
+def upgrade():
+    # Mismo orden que ORDER_CURSOR_COLUMNS: la búsqueda por cursor y el ORDER BY ... LIMIT usan el índice
+    op.create_index(ORDERS_CREATED_AT_INDEX, "order", ["created_at", "id"])
+
+
+def downgrade():
+    op.drop_index(ORDERS_CREATED_AT_INDEX, table_name="order")
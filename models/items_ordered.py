@@ -1,3 +1,4 @@
+from sqlalchemy import ForeignKeyConstraint, UniqueConstraint
 from sqlmodel import SQLModel, Field
 from typing import Optional
 
@@ -7,16 +8,30 @@ class ItemsOrderedBase(SQLModel):
     quantity: int = Field(default=1, ge=1)
 
 class ItemsOrdered(ItemsOrderedBase, table=True):
+    # Los datos del producto se leen de su versión en la tabla product; aquí solo queda el precio de compra
+    __table_args__ = (
+        UniqueConstraint("order_id", "item_id", name="uq_itemsordered_order_id_item_id"),
+        ForeignKeyConstraint(
+            ["item_id", "product_version"], ["product.item_id", "product.version"],
+            name="fk_itemsordered_product"
+        ),
+    )
+
     id: int = Field(default=None, primary_key=True)
-    title: str = Field(index=True, nullable=False)
-    description: Optional[str] = Field(default=None)
-    category: str = Field(nullable=False)
+    product_version: int = Field(nullable=False)
     price: float = Field(default=0.0)
-    rating: float = Field(default=0.0)
-    brand: str = Field(nullable=False)
 
 class ItemsOrderedCreate(ItemsOrderedBase):
     pass
+
+class ItemsOrderedBulkEntry(SQLModel):
+    item_id: int
+    quantity: int = Field(default=1, ge=1)
+
+class ItemsOrderedBulkCreate(SQLModel):
+    order_id: int
+    items: list[ItemsOrderedBulkEntry]
+
 class ItemsOrderedRead(ItemsOrderedBase):
     title: str
     description: Optional[str]
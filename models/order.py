@@ -1,12 +1,23 @@
 import datetime
+from sqlalchemy import Index
 from sqlmodel import SQLModel, Field
 
 class OrderBase(SQLModel):
     owner_id: int = Field(default=None, foreign_key="user.id", ondelete="CASCADE")
 
 class Order(OrderBase, table=True):
+    # Listado de pedidos de un usuario por fecha (también sirve para filtrar solo por owner_id)
+    # y listado completo de admin, paginado por (created_at, id)
+    __table_args__ = (
+        Index("ix_order_owner_id_created_at", "owner_id", "created_at"),
+        Index("ix_order_created_at_id", "created_at", "id"),
+    )
+
     id: int = Field(default=None, primary_key=True)
-    created_at: datetime.datetime = Field(default_factory=lambda: datetime.datetime.now(datetime.timezone.utc))
+    # UTC sin zona horaria: la columna es timestamp without time zone y asyncpg no acepta fechas con zona
+    created_at: datetime.datetime = Field(
+        default_factory=lambda: datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+    )
 
 class OrderCreate(OrderBase):
     pass
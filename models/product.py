@@ -0,0 +1,29 @@
+import hashlib
+import json
+from sqlalchemy import UniqueConstraint
+from sqlmodel import SQLModel, Field
+from typing import Optional
+
+# Campos del catálogo que se guardan en cada versión del producto
+PRODUCT_SNAPSHOT_FIELDS = ("title", "description", "category", "price", "rating", "brand")
+
+def product_content_hash(product: dict) -> str:
+    """Huella de los datos del producto: una versión nueva solo si cambia el contenido."""
+    values = [product.get(field) for field in PRODUCT_SNAPSHOT_FIELDS]
+    # Precio y rating como float, igual que al leerlos de la base de datos
+    values[3], values[4] = float(values[3] or 0.0), float(values[4] or 0.0)
+    return hashlib.sha256(json.dumps(values).encode("utf-8")).hexdigest()
+
+class Product(SQLModel, table=True):
+    """Copia de los datos de un producto del catálogo externo, una fila por cada versión distinta."""
+    __table_args__ = (UniqueConstraint("item_id", "content_hash", name="uq_product_item_id_content_hash"),)
+
+    item_id: int = Field(primary_key=True)
+    version: int = Field(primary_key=True)
+    content_hash: str = Field(nullable=False)
+    title: str = Field(nullable=False)
+    description: Optional[str] = Field(default=None)
+    category: str = Field(nullable=False)
+    price: float = Field(default=0.0)
+    rating: float = Field(default=0.0)
+    brand: str = Field(nullable=False)
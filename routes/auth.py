@@ -1,25 +1,29 @@
-from fastapi import APIRouter, Depends, HTTPException, Form, Request
+import json
+from fastapi import APIRouter, Depends, HTTPException, Form, Query, Request
 from fastapi.security import OAuth2PasswordRequestForm
-from fastapi.responses import HTMLResponse, RedirectResponse
-from fastapi.templating import Jinja2Templates
+from fastapi.responses import HTMLResponse, RedirectResponse, StreamingResponse
 from sqlmodel import Session, select
-from auth import redis_client
+from auth.redis_client import client_redis
+from auth.revocation import REVOKED_TOKENS_KEY
 from auth.jwt import(
     create_access_token, create_refresh_token,
     verify_refresh_token, revoke_token, verify_access_token, is_token_revoked
 )
-from auth.hashing import hash_password, verify_password, validate_password_strength
+from auth.hashing import HashingBusyError, hash_password, needs_rehash, verify_password, validate_password_strength
 from db.database import get_session
 from auth.dependencies import get_current_user, oauth2_scheme, verify_current_password, require_role
 from models.user import User, UserCreate, UserRead
+from services.data_versions import bump_versions
+from services.query_detector import query_budget
+from services.templating import templates
 from logging import getLogger
 
 logger = getLogger(__name__)
 
 router = APIRouter()
-templates = Jinja2Templates(directory="templates")
 
 @router.post("/register", response_model=UserRead)
+@query_budget(3)
 def register(user: UserCreate, session: Session = Depends(get_session)):
     try:
         validate_password_strength(user.password)  # Validate password strength
@@ -36,24 +40,34 @@ def register(user: UserCreate, session: Session = Depends(get_session)):
         )
         session.add(new_user)
         session.commit()
+        bump_versions("users")
         session.refresh(new_user)
         return new_user
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.post("/login")
+@query_budget(2)
 def login(form_data: OAuth2PasswordRequestForm = Depends(), session: Session = Depends(get_session)):
     statement = select(User).where(User.username == form_data.username)
     user = session.exec(statement).first()
     if not user or not verify_password(form_data.password, user.hashed_password):
         logger.warning(f"Failed login attempt for username: {form_data.username}")
         raise HTTPException(status_code=401, detail="Invalid credentials")
-    token = create_access_token({"sub": user.username}, role=user.role)
-    refresh_token = create_refresh_token({"sub": user.username})
+    if needs_rehash(user.hashed_password):
+        # Actualizar de forma transparente los hashes generados con un coste antiguo
+        try:
+            user.hashed_password = hash_password(form_data.password)
+        except HashingBusyError:
+            logger.info(f"Skipping password rehash for {user.username}, hashing pool is busy")
+    # Leído antes del commit: después la fila caduca y acceder a ella la recargaría
+    username = user.username
+    token = create_access_token({"sub": username}, role=user.role)
+    refresh_token = create_refresh_token({"sub": username})
     user.refresh_token = refresh_token
     session.add(user)
     session.commit()
-    logger.info(f"User {user.username} logged in successfully")
+    logger.info(f"User {username} logged in successfully")
     return {
         "access_token": token,
         "refresh_token": refresh_token,
@@ -61,6 +75,7 @@ def login(form_data: OAuth2PasswordRequestForm = Depends(), session: Session = D
     }
 
 @router.post("/refresh")
+@query_budget(1)
 def refresh_token(refresh_token: str, session: Session = Depends(get_session)):
     payload = verify_refresh_token(refresh_token)
     if not payload:
@@ -73,6 +88,7 @@ def refresh_token(refresh_token: str, session: Session = Depends(get_session)):
     return {"access_token": new_access_token, "token_type": "bearer"}
 
 @router.post("/logout")
+@query_budget(3)
 def logout(current_user: dict = Depends(get_current_user), token: str = Depends(oauth2_scheme), session: Session = Depends(get_session)):
     statement = select(User).where(User.username == current_user["username"])
     user = session.exec(statement).first()
@@ -83,14 +99,16 @@ def logout(current_user: dict = Depends(get_current_user), token: str = Depends(
     session.add(user)
     session.commit()
     revoke_token(token)
-    logger.info(f"User {user.username} logged out successfully")
+    logger.info(f"User {current_user['username']} logged out successfully")
     return {"message": "Successfully logged out"}
 
 @router.get("/forgot-password", response_class=HTMLResponse)
+@query_budget(0)
 def forgot_password_view(request: Request):
     return templates.TemplateResponse("forgot_password.html", {"request": request})
 
 @router.post("/forgot-password")
+@query_budget(1)
 def forgot_password(email: str = Form(...), session: Session = Depends(get_session)):
     statement = select(User).where(User.email == email)
     user = session.exec(statement).first()
@@ -102,6 +120,7 @@ def forgot_password(email: str = Form(...), session: Session = Depends(get_sessi
     return {"message": "Use this token to reset your password", "token": token}
 
 @router.post("/reset-password")
+@query_budget(2)
 def reset_password(token: str = Form(...), new_password: str = Form(...), session: Session = Depends(get_session)):
     payload = verify_access_token(token)
     if not payload or payload.get("role") != "reset":
@@ -116,10 +135,11 @@ def reset_password(token: str = Form(...), new_password: str = Form(...), sessio
     user.hashed_password = hash_password(new_password)
     session.add(user)
     session.commit()
-    logger.info(f"Password reset successfully for email: {user.email}")
+    logger.info(f"Password reset successfully for email: {email}")
     return RedirectResponse(url="/", status_code=303)
 
 @router.post("/change-password")
+@query_budget(3)
 def change_password(
     current_password: str = Form(...),
     new_password: str = Form(...),
@@ -134,12 +154,45 @@ def change_password(
     session.commit()
     return {"message": "Password updated successfully"}
 
-@router.get("/revoked-tokens", response_model=list[str])
-def list_revoked_tokens(current_user: dict = Depends(require_role("admin"))):
-    keys = redis_client.keys("REVOKED_TOKENS_KEY:*")
-    return [key.split(":")[1] for key in keys if redis_client.exists(key)]
+@router.get("/revoked-tokens")
+@query_budget(1)
+def list_revoked_tokens(
+    cursor: int = Query(0, ge=0, description="Cursor devuelto por la página anterior (0 para empezar)"),
+    limit: int = Query(1000, ge=1, le=10000, description="Número aproximado de revocaciones por página"),
+    current_user: dict = Depends(require_role("admin"))
+):
+    """
+    Lista las revocaciones con SCAN (sin bloquear Redis como KEYS) y las devuelve
+    en streaming junto al cursor de la página siguiente (`next_cursor` 0 indica el final).
+    """
+    prefix_length = len(REVOKED_TOKENS_KEY) + 1
+    scan_count = min(limit, 1000)
+
+    def stream():
+        scan_cursor = cursor
+        returned = 0
+        separator = ""
+        yield '{"tokens": ['
+        while True:
+            scan_cursor, keys = client_redis.scan(cursor=scan_cursor, match=f"{REVOKED_TOKENS_KEY}:*", count=scan_count)
+            if keys:
+                pipeline = client_redis.pipeline(transaction=False)
+                for key in keys:
+                    pipeline.ttl(key)
+                for key, ttl in zip(keys, pipeline.execute()):
+                    if ttl == -2:  # Caducada entre SCAN y TTL
+                        continue
+                    yield separator + json.dumps({"id": key[prefix_length:], "ttl": ttl})
+                    separator = ","
+                    returned += 1
+            if scan_cursor == 0 or returned >= limit:
+                break
+        yield f'], "next_cursor": {scan_cursor}}}'
+
+    return StreamingResponse(stream(), media_type="application/json")
 
 @router.post("/revoke-token")
+@query_budget(1)
 def revoke_token_endpoint(token: str = Form(...), current_user: dict = Depends(require_role("admin"))):
     if is_token_revoked(token):
         raise HTTPException(status_code=400, detail="Token is already revoked")
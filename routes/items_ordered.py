@@ -1,20 +1,35 @@
-from fastapi import APIRouter, Body, Depends, HTTPException, Path, Query
-from sqlmodel import Session, select
+import asyncio
+import httpx
+from fastapi import APIRouter, Body, Depends, HTTPException, Path, Query, Request
+from pydantic import TypeAdapter
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from auth.dependencies import require_role
-from db.database import get_session
-from models.items_ordered import ItemsOrderedCreate, ItemsOrderedRead
+from auth.dependencies import require_role_async
+from db.database import get_async_session
+from models.items_ordered import ItemsOrderedBulkCreate, ItemsOrderedCreate, ItemsOrderedRead
+from crud.pagination import InvalidCursorError, next_cursor
 from crud.items_ordered import(
-    add_item_ordered,
-    get_items_ordered,
-    modify_item_quantity,
-    delete_items_ordered
+    ITEM_CURSOR_COLUMNS,
+    add_item_ordered_async,
+    add_items_ordered_bulk_async,
+    get_items_ordered_async,
+    modify_item_quantity_async,
+    delete_items_ordered_async
 )
 from models.order import Order
+from services.http_client import get_http_client
+from services.data_versions import order_entity
+from services.query_detector import query_budget
+from services.response_cache import FAST_LIST_RESPONSES, CachedResponse, serialize, serialize_rows
 
 router = APIRouter()
 
+ITEM_LIST = TypeAdapter(list[ItemsOrderedRead])
+ITEM_READ_FIELDS = tuple(ItemsOrderedRead.model_fields)
+
 @router.post("/items/add_item", response_model=ItemsOrderedRead)
+@query_budget(8)
 async def add_item_to_order(
     item_data: ItemsOrderedCreate = Body(
         ...,
@@ -29,10 +44,11 @@ async def add_item_to_order(
             }
         }
     ),
-    session: Session = Depends(get_session),
-    current_user: dict = Depends(require_role("admin", "client"))
+    session: AsyncSession = Depends(get_async_session),
+    client: httpx.AsyncClient = Depends(get_http_client),
+    current_user: dict = Depends(require_role_async("admin", "client"))
 ):
-    order = session.exec(select(Order).where(Order.id == item_data.order_id)).first()
+    order = await session.get(Order, item_data.order_id)
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
 
@@ -40,11 +56,12 @@ async def add_item_to_order(
         raise HTTPException(status_code=403, detail="Not authorized to modify this order")
 
     try:
-        item = await add_item_ordered(
+        item = await add_item_ordered_async(
             session=session,
             product_id=item_data.item_id,
             order_id=item_data.order_id,
-            quantity=item_data.quantity
+            quantity=item_data.quantity,
+            client=client
         )
         return item
     except ValueError as e:
@@ -52,42 +69,104 @@ async def add_item_to_order(
     except Exception as e:
         raise HTTPException(status_code=500, detail="Error adding item to order")
 
+@router.post("/items/add_items", response_model=list[ItemsOrderedRead])
+@query_budget(7)
+async def add_items_to_order(
+    bulk_data: ItemsOrderedBulkCreate = Body(
+        ...,
+        examples={
+            "example": {
+                "summary": "Several items for one order",
+                "value": {
+                    "order_id": 1,
+                    "items": [
+                        {"item_id": 1, "quantity": 3},
+                        {"item_id": 2, "quantity": 1},
+                    ]
+                }
+            }
+        }
+    ),
+    session: AsyncSession = Depends(get_async_session),
+    client: httpx.AsyncClient = Depends(get_http_client),
+    current_user: dict = Depends(require_role_async("admin", "client"))
+):
+    if not bulk_data.items:
+        raise HTTPException(status_code=400, detail="No items provided")
+
+    order = await session.get(Order, bulk_data.order_id)
+    if not order:
+        raise HTTPException(status_code=404, detail="Order not found")
+
+    if order.owner_id != current_user["id"] and current_user["role"] != "admin":
+        raise HTTPException(status_code=403, detail="Not authorized to modify this order")
+
+    try:
+        items = await add_items_ordered_bulk_async(
+            session=session,
+            order_id=bulk_data.order_id,
+            items=bulk_data.items,
+            client=client
+        )
+        return items
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail="Error adding items to order")
+
 @router.get("/items/", response_model=list[ItemsOrderedRead])
-def read_items(
+@query_budget(3)
+async def read_items(
     order_id: int = Query(..., description="Order ID to filter items by"),
     item_id: int = Query(None, description="Item ID to filter items by"),
     skip: int = 0,
     limit: int = 100,
-    session: Session = Depends(get_session),
-    current_user: dict = Depends(require_role("admin", "client"))
+    cursor: str = Query(None, description="Cursor of the next page (X-Next-Cursor); replaces skip"),
+    request: Request = None,
+    session: AsyncSession = Depends(get_async_session),
+    current_user: dict = Depends(require_role_async("admin", "client"))
 ):
+    # Los usuarios cuentan porque borrar uno elimina en cascada sus pedidos
+    cache = CachedResponse(request, current_user, order_entity(order_id), "users")
+    cached = await asyncio.to_thread(cache.lookup)
+    if cached is not None:
+        return cached
     try:
         if current_user["role"] == "client":
-            order = session.exec(
+            order = (await session.exec(
                 select(Order).where(Order.id == order_id, Order.owner_id == current_user["id"])
-            ).first()
+            )).first()
             if not order:
                 raise HTTPException(status_code=403, detail="Not authorized to access this order")
 
-        items = get_items_ordered(session, order_id=order_id, item_id=item_id, skip=skip, limit=limit)
+        items = await get_items_ordered_async(session, order_id=order_id, item_id=item_id, skip=skip, limit=limit, cursor=cursor)
 
         if not items:
             raise HTTPException(status_code=404, detail="No items found for this order")
 
-        return items
+        headers = {}
+        page_cursor = next_cursor(items, ITEM_CURSOR_COLUMNS, limit)
+        if page_cursor:
+            headers["X-Next-Cursor"] = page_cursor
+        # Los ítems ya se leen como proyección de columnas: solo cambia la serialización
+        body = serialize_rows(items, ITEM_READ_FIELDS) if FAST_LIST_RESPONSES else serialize(ITEM_LIST, items)
+        return await asyncio.to_thread(cache.respond, body, headers)
 
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
 
 @router.put("/items/{item_id}", response_model=ItemsOrderedRead)
-def update_item_quantity(
+@query_budget(5)
+async def update_item_quantity(
     order_id: int = Query(..., description="ID del pedido al que pertenece el ítem"),
     item_id: int = Path(..., description="ID del ítem en el pedido"),
     new_quantity: int = Body(..., embed=True, ge=0, description="Nueva cantidad del ítem (0 para eliminar)"),
-    session: Session = Depends(get_session),
-    current_user: dict = Depends(require_role("admin", "client"))
+    session: AsyncSession = Depends(get_async_session),
+    current_user: dict = Depends(require_role_async("admin", "client"))
 ):
-    order = session.get(Order, order_id)
+    order = await session.get(Order, order_id)
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
     
@@ -96,29 +175,30 @@ def update_item_quantity(
 
     try:
         if new_quantity == 0:
-            deleted_item = delete_items_ordered(session, item_id=item_id, order_id=order_id)
+            deleted_item = await delete_items_ordered_async(session, item_id=item_id, order_id=order_id)
             return deleted_item
         else:
-            updated_item = modify_item_quantity(session, item_id=item_id, order_id=order_id, new_quantity=new_quantity)
+            updated_item = await modify_item_quantity_async(session, item_id=item_id, order_id=order_id, new_quantity=new_quantity)
             return updated_item
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
 
 @router.delete("/items/{item_id}", response_model=ItemsOrderedRead)
-def delete_item_from_order(
+@query_budget(4)
+async def delete_item_from_order(
     order_id: int = Query(..., description="Order ID to delete item from"),
     item_id: int = Path(..., description="Item ID to delete"),
-    session: Session = Depends(get_session),
-    current_user: dict = Depends(require_role("admin", "client"))
+    session: AsyncSession = Depends(get_async_session),
+    current_user: dict = Depends(require_role_async("admin", "client"))
 ):
-    order = session.get(Order, order_id)
+    order = await session.get(Order, order_id)
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
     if current_user["role"] == "client" and order.owner_id != current_user["id"]:
         raise HTTPException(status_code=403, detail="Not authorized to delete from this order")
 
     try:
-        deleted_item = delete_items_ordered(session, item_id=item_id, order_id=order_id)
+        deleted_item = await delete_items_ordered_async(session, item_id=item_id, order_id=order_id)
         return deleted_item
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
@@ -0,0 +1,88 @@
+import asyncio
+import os
+import secrets
+from typing import Literal
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import JSONResponse, PlainTextResponse
+
+from auth.dependencies import require_role
+from db.database import get_pool_stats as get_db_pool_stats
+from services.http_client import get_pool_stats
+from services.instrumentation import render_metrics
+from services.profiler import (
+    PROFILE_INTERVAL_MS,
+    PROFILE_MAX_SECONDS,
+    collapsed,
+    load_profile,
+    speedscope,
+    start_sampler,
+)
+from services.query_detector import query_budget
+
+# Token que debe enviar Prometheus en /metrics (vacío: sin autenticación)
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
+router = APIRouter()
+# /metrics va fuera de /api, donde lo espera Prometheus por defecto
+metrics_router = APIRouter()
+
+@router.get("/monitoring/http-pool")
+@query_budget(1)
+def http_pool_stats(current_user: dict = Depends(require_role("admin"))):
+    return get_pool_stats()
+
+@router.get("/monitoring/db-pool")
+@query_budget(1)
+def db_pool_stats(current_user: dict = Depends(require_role("admin"))):
+    return get_db_pool_stats()
+
+def _profile_response(samples, interval: float, name: str, profile_format: str):
+    if profile_format == "collapsed":
+        return PlainTextResponse(
+            collapsed(samples), headers={"Content-Disposition": 'attachment; filename="profile.folded"'}
+        )
+    return JSONResponse(
+        speedscope(samples, interval, name),
+        headers={"Content-Disposition": 'attachment; filename="profile.speedscope.json"'}
+    )
+
+@router.get("/monitoring/profile")
+@query_budget(1)
+async def profile_worker(
+    seconds: float = Query(10, gt=0, le=PROFILE_MAX_SECONDS, description="Duración del muestreo"),
+    interval_ms: float = Query(PROFILE_INTERVAL_MS, ge=1, le=1000, description="Intervalo entre muestras"),
+    profile_format: Literal["speedscope", "collapsed"] = Query("speedscope", alias="format"),
+    current_user: dict = Depends(require_role("admin"))
+):
+    """
+    Muestrea durante `seconds` las pilas de todos los hilos del worker que atiende la
+    petición y devuelve un perfil para speedscope o en formato colapsado (flamegraph).
+    """
+    interval = interval_ms / 1000
+    sampler = start_sampler(interval, seconds)
+    if sampler is None:
+        raise HTTPException(status_code=409, detail="A profile is already running in this worker")
+    await asyncio.sleep(seconds)
+    samples = await asyncio.to_thread(sampler.stop)
+    return _profile_response(samples, interval, f"worker {os.getpid()}", profile_format)
+
+@router.get("/monitoring/profiles/{profile_id}")
+@query_budget(1)
+def read_request_profile(
+    profile_id: str,
+    profile_format: Literal["speedscope", "collapsed"] = Query("speedscope", alias="format"),
+    current_user: dict = Depends(require_role("admin"))
+):
+    """Perfil de una petición marcada con X-Profile-Token (cabecera X-Profile-Id de su respuesta)."""
+    profile = load_profile(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    samples, interval, name = profile
+    return _profile_response(samples, interval, name, profile_format)
+
+@metrics_router.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+@query_budget(0)
+async def metrics(authorization: str = Header(None)):
+    if METRICS_TOKEN and not secrets.compare_digest(authorization or "", f"Bearer {METRICS_TOKEN}"):
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
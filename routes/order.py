@@ -1,60 +1,89 @@
-from fastapi import APIRouter, Body, Depends, HTTPException, Query
-from sqlmodel import Session
+import asyncio
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, Request
+from pydantic import TypeAdapter
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from auth.dependencies import require_role
-from db.database import get_session
+from auth.dependencies import require_role_async
+from db.database import get_async_session
 from models.order import Order, OrderCreate, OrderRead
-from crud.user import get_users
+from services.query_detector import query_budget
+from services.response_cache import FAST_LIST_RESPONSES, CachedResponse, serialize, serialize_rows
+from crud.pagination import next_cursor
+from crud.user import get_users_async
 from crud.order import (
-    create_order,
-    delete_order,
-    get_orders,
+    ORDER_CURSOR_COLUMNS,
+    ORDER_READ_COLUMNS,
+    create_order_async,
+    delete_order_async,
+    get_orders_async,
+    update_order_async,
 )
 
 router = APIRouter()
 
+ORDER_LIST = TypeAdapter(list[OrderRead])
+ORDER_READ_FIELDS = tuple(OrderRead.model_fields)
+
 @router.post("/orders/", response_model=OrderRead)
-def create(
-    order: OrderCreate, session: Session = Depends(get_session), current_user: dict = Depends(require_role("admin"))
+@query_budget(5)
+async def create(
+    order: OrderCreate, session: AsyncSession = Depends(get_async_session), current_user: dict = Depends(require_role_async("admin"))
 ):
     try:
         if current_user["role"] != "admin" and order.owner_id != current_user["id"]:
             raise HTTPException(status_code=403, detail="Insufficient permissions to create an order for another user")
-        owner = get_users(session, id=order.owner_id)
+        owner = await get_users_async(session, id=order.owner_id)
         if not owner:
             raise HTTPException(status_code=404, detail="User not found")
         if isinstance(owner, list):
             owner = owner[0]
         order_data = order.model_dump(exclude={"id", "created_at"})
         order_data["owner_id"] = owner.id
-        created_order = create_order(session, **order_data)
-        session.refresh(created_order)
+        created_order = await create_order_async(session, **order_data)
+        await session.refresh(created_order)
         return created_order
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.get("/orders/", response_model=list[OrderRead])
-def read(
+@query_budget(3)
+async def read(
     order_id: int = Query(None, description="Order ID"),
     owner_id: int = Query(None, description="Order owner ID"),
     username: str = Query(None, description="Order owner username"),
     email: str = Query(None, description="Order owner email"),
     skip: int = Query(0, description="Number of orders to skip"),
     limit: int = Query(100, description="Maximum number of orders to return"),
-    session: Session = Depends(get_session),
-    current_user: dict = Depends(require_role("admin", "client"))
+    cursor: str = Query(None, description="Cursor of the next page (X-Next-Cursor); replaces skip"),
+    request: Request = None,
+    session: AsyncSession = Depends(get_async_session),
+    current_user: dict = Depends(require_role_async("admin", "client"))
 ):
+    # El filtro por username/email depende también de los usuarios
+    cache = CachedResponse(request, current_user, "orders", "users")
+    cached = await asyncio.to_thread(cache.lookup)
+    if cached is not None:
+        return cached
     if current_user["role"] == "admin":
         owner_id = owner_id
     if current_user["role"] == "client":
         owner_id = current_user["id"]
-    orders = get_orders(session, order_id=order_id, owner_id=owner_id, username=username, email=email, skip=skip, limit=limit)
+    orders = await get_orders_async(
+        session, order_id=order_id, owner_id=owner_id, username=username, email=email, skip=skip, limit=limit, cursor=cursor,
+        columns=ORDER_READ_COLUMNS if FAST_LIST_RESPONSES else None
+    )
     if not orders:
         raise HTTPException(status_code=404, detail="No orders found")
-    return orders
+    headers = {}
+    page_cursor = next_cursor(orders, ORDER_CURSOR_COLUMNS, limit)
+    if page_cursor:
+        headers["X-Next-Cursor"] = page_cursor
+    body = serialize_rows(orders, ORDER_READ_FIELDS) if FAST_LIST_RESPONSES else serialize(ORDER_LIST, orders)
+    return await asyncio.to_thread(cache.respond, body, headers)
 
 @router.put("/orders/{order_id}", response_model=OrderRead)
-def update_order(
+@query_budget(4)
+async def update_order(
     order_id: int,
     order_data: OrderCreate = Body(
         ...,
@@ -67,10 +96,10 @@ def update_order(
             }
         }
     ),
-    session: Session = Depends(get_session),
-    current_user: dict = Depends(require_role("admin"))
+    session: AsyncSession = Depends(get_async_session),
+    current_user: dict = Depends(require_role_async("admin"))
 ):
-    existing_order = session.get(Order, order_id)
+    existing_order = await session.get(Order, order_id)
     if not existing_order:
         raise HTTPException(status_code=404, detail="Order not found")
     
@@ -78,25 +107,26 @@ def update_order(
         raise HTTPException(status_code=403, detail="Insufficient permissions to change order ownership")
     
     order_data_dict = order_data.model_dump()
-    updated_order = update_order(session, order_id, order_data_dict)
+    updated_order = await update_order_async(session, order_id, order_data_dict)
     if not updated_order:
         raise HTTPException(status_code=404, detail="Order not found")
     return updated_order
 
 @router.delete("/orders/{order_id}", response_model=OrderRead)
-def delete(
+@query_budget(3)
+async def delete(
     order_id: int,
-    session: Session = Depends(get_session),
-    current_user: dict = Depends(require_role("admin"))
+    session: AsyncSession = Depends(get_async_session),
+    current_user: dict = Depends(require_role_async("admin"))
 ):
-    existing_order = session.get(Order, order_id)
+    existing_order = await session.get(Order, order_id)
     if not existing_order:
         raise HTTPException(status_code=404, detail="Order not found")
 
     if existing_order.owner_id != current_user["id"] and current_user["role"] != "admin":
         raise HTTPException(status_code=403, detail="Insufficient permissions to delete another user's order")
     
-    deleted_order = delete_order(session, order_id)
+    deleted_order = await delete_order_async(session, order_id)
     if not deleted_order:
         raise HTTPException(status_code=404, detail="Order not found")
     return deleted_order
@@ -1,14 +1,19 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from typing import Literal
+from fastapi import APIRouter, Depends, HTTPException, Path, Query
+from fastapi.responses import FileResponse
 from sqlmodel import Session
-from crud.report import generate_excel_report, generate_csv_report, generate_pdf_report
+from crud.report import REPORT_FORMATS, generate_excel_report, generate_csv_report, generate_pdf_report, stream_csv_report
 from db.database import get_session
 from auth.dependencies import require_role
+from services.query_detector import query_budget
+from services.report_jobs import artifact_path, get_job, submit_report_job
 
 router = APIRouter()
 
 @router.get("/report/excel")
+@query_budget(4)
 def excel_report(
-    order_id: int = Query(...),
+    order_id: int = Query(None, description="Sin pedido ni usuario (solo admin) se exportan todos los ítems"),
     user_id: int = Query(None),
     item_id: int = Query(None),
     skip: int = Query(0),
@@ -24,23 +29,28 @@ def excel_report(
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.get("/report/csv")
+@query_budget(4)
 def csv_report(
     order_id: int = Query(...),
     user_id: int = Query(None),
     item_id: int = Query(None),
     skip: int = Query(0),
     limit: int = Query(100),
+    stream: bool = Query(False, description="Enviar el CSV en streaming sin cargarlo entero en memoria"),
     session: Session = Depends(get_session),
     current_user: dict = Depends(require_role("admin", "client"))
 ):
     if current_user["role"] == "client":
         user_id = current_user["id"]
     try:
+        if stream:
+            return stream_csv_report(session, order_id=order_id, user_id=user_id, item_id=item_id, skip=skip, limit=limit)
         return generate_csv_report(session, order_id=order_id, user_id=user_id, item_id=item_id, skip=skip, limit=limit)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.get("/report/pdf")
+@query_budget(4)
 def pdf_report(
     order_id: int = Query(...),
     user_id: int = Query(None),
@@ -55,4 +65,54 @@ def pdf_report(
     try:
         return generate_pdf_report(session, order_id=order_id, user_id=user_id, item_id=item_id, skip=skip, limit=limit)
     except ValueError as e:
-        raise HTTPException(status_code=400, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.post("/report/{report_format}", status_code=202)
+@query_budget(2)
+def create_report_job(
+    report_format: Literal["excel", "csv", "pdf"] = Path(..., description="Formato del informe"),
+    order_id: int = Query(None),
+    user_id: int = Query(None),
+    item_id: int = Query(None),
+    skip: int = Query(0),
+    limit: int = Query(100),
+    session: Session = Depends(get_session),
+    current_user: dict = Depends(require_role("admin", "client"))
+):
+    if current_user["role"] == "client":
+        user_id = current_user["id"]
+    params = {"order_id": order_id, "user_id": user_id, "item_id": item_id, "skip": skip, "limit": limit}
+    try:
+        return submit_report_job(session, report_format, params, owner_id=current_user["id"])
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def _get_owned_job(job_id: str, current_user: dict) -> dict:
+    job = get_job(job_id)
+    if not job or (current_user["role"] != "admin" and job["owner_id"] != str(current_user["id"])):
+        raise HTTPException(status_code=404, detail="Report job not found")
+    return job
+
+@router.get("/report/jobs/{job_id}")
+@query_budget(1)
+def read_report_job(job_id: str, current_user: dict = Depends(require_role("admin", "client"))):
+    job = _get_owned_job(job_id, current_user)
+    return {
+        "job_id": job_id,
+        "status": job["status"],
+        "format": job["format"],
+        "cached": job.get("cached") == "1",
+        "error": job.get("error"),
+    }
+
+@router.get("/report/jobs/{job_id}/download")
+@query_budget(1)
+def download_report_job(job_id: str, current_user: dict = Depends(require_role("admin", "client"))):
+    job = _get_owned_job(job_id, current_user)
+    if job["status"] != "done":
+        raise HTTPException(status_code=409, detail=f"Report is not ready (status: {job['status']})")
+    path = artifact_path(job["artifact"], job["format"])
+    if not path.exists():
+        raise HTTPException(status_code=404, detail="Report artifact has expired")
+    _, media_type, extension = REPORT_FORMATS[job["format"]]
+    return FileResponse(path, media_type=media_type, filename=f"items_ordered.{extension}")
@@ -1,21 +1,32 @@
-from fastapi import APIRouter, Body, Depends, HTTPException, Query
-from sqlmodel import Session
+import asyncio
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, Request
+from pydantic import TypeAdapter
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from auth.dependencies import require_role
-from db.database import get_session
+from auth.dependencies import require_role_async
+from db.database import get_async_session
 from models.user import UserCreate, UserRead
+from services.query_detector import query_budget
+from services.response_cache import FAST_LIST_RESPONSES, CachedResponse, serialize, serialize_rows
+from crud.pagination import next_cursor
 from crud.user import(
-    create_user,
-    delete_user,
-    get_users,
-    update_user
+    USER_CURSOR_COLUMNS,
+    USER_READ_COLUMNS,
+    create_user_async,
+    delete_user_async,
+    get_users_async,
+    update_user_async
 )
 
 
 router = APIRouter()
 
+USER_LIST = TypeAdapter(list[UserRead])
+USER_READ_FIELDS = tuple(UserRead.model_fields)
+
 @router.post("/users/", response_model=UserRead)
-def create(
+@query_budget(4)
+async def create(
     user_data: UserCreate = Body(
         ...,
         examples={
@@ -30,57 +41,72 @@ def create(
             }
         }
     ),
-    session: Session = Depends(get_session),
-    current_user: dict = Depends(require_role("admin"))
+    session: AsyncSession = Depends(get_async_session),
+    current_user: dict = Depends(require_role_async("admin"))
 ):
     try:
-        created_user = create_user(session, user_data.username, user_data.email, user_data.password, user_data.role)
+        created_user = await create_user_async(session, user_data.username, user_data.email, user_data.password, user_data.role)
         return created_user
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.get("/users/", response_model=list[UserRead])
-def read(
+@query_budget(2)
+async def read(
     id: int = Query(None, description="ID del usuario"),
     username: str = Query(None, description="Nombre de usuario"),
     email: str = Query(None, description="Correo electrónico"),
     skip: int = Query(0, description="Número de usuarios a omitir"),
     limit: int = Query(100, description="Número máximo de usuarios a devolver"),
-    session: Session = Depends(get_session),
-    current_user: dict = Depends(require_role("admin", "client"))
+    cursor: str = Query(None, description="Cursor de la página siguiente (X-Next-Cursor); sustituye a skip"),
+    request: Request = None,
+    session: AsyncSession = Depends(get_async_session),
+    current_user: dict = Depends(require_role_async("admin", "client"))
 ):
+    cache = CachedResponse(request, current_user, "users")
+    cached = await asyncio.to_thread(cache.lookup)
+    if cached is not None:
+        return cached
+    columns = USER_READ_COLUMNS if FAST_LIST_RESPONSES else None
     if current_user["role"] == "client":
-        users = get_users(session, id=current_user["id"])
+        users = await get_users_async(session, id=current_user["id"], columns=columns)
     else:    
-        users = get_users(session, id=id, username=username, email=email, skip=skip, limit=limit)
+        users = await get_users_async(session, id=id, username=username, email=email, skip=skip, limit=limit, cursor=cursor, columns=columns)
     if not users:
         raise HTTPException(status_code=404, detail="No users found")
-    return users
+    headers = {}
+    page_cursor = next_cursor(users, USER_CURSOR_COLUMNS, limit)
+    if page_cursor:
+        headers["X-Next-Cursor"] = page_cursor
+    body = serialize_rows(users, USER_READ_FIELDS) if FAST_LIST_RESPONSES else serialize(USER_LIST, users)
+    return await asyncio.to_thread(cache.respond, body, headers)
 
 
 @router.put("/users/{user_id}", response_model=UserRead)
-def update(
+@query_budget(4)
+async def update(
     user_id: int,
     user_data: UserCreate = Body(...),
-    session: Session = Depends(get_session),
-    current_user: dict = Depends(require_role("admin", "client"))
+    session: AsyncSession = Depends(get_async_session),
+    current_user: dict = Depends(require_role_async("admin", "client"))
 ):
     if (current_user["role"] == "client") and current_user["id"] != user_id:
         raise HTTPException(status_code=403, detail="You can only update your own user data")
-    updated_user = update_user(session, user_id, user_data)
+    updated_user = await update_user_async(session, user_id, user_data)
     if not updated_user:
         raise HTTPException(status_code=404, detail="User not found")
     return updated_user
 
 @router.delete("/users/{user_id}", response_model=UserRead)
-def delete(
+@query_budget(3)
+async def delete(
     user_id: int,
-    session: Session = Depends(get_session),
-    current_user: dict = Depends(require_role("admin", "client"))
+    session: AsyncSession = Depends(get_async_session),
+    current_user: dict = Depends(require_role_async("admin", "client"))
 ):
     if current_user["role"] == "client":
         user_id = current_user["id"]
-    deleted_user = delete_user(session, user_id)
+    deleted_user = await delete_user_async(session, user_id)
     if not deleted_user:
         raise HTTPException(status_code=404, detail="User not found")
     return deleted_user
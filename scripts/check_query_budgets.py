@@ -0,0 +1,214 @@
+"""
+Comprueba los presupuestos de sentencias SQL (@query_budget) de todas las rutas.
+
+Ejecuta cada ruta con presupuesto con el detector en modo strict y con las cachés
+de principales y de respuestas vacías antes de cada petición (el peor caso), contra
+el Postgres y el Redis de .env y el catálogo stub:
+
+    docker-compose up -d db redis
+    python -m scripts.check_query_budgets
+
+Crea sus propios usuarios, pedidos e ítems (con un sufijo aleatorio) y los borra al
+terminar. Sale con código 1 si alguna ruta supera su presupuesto, falla o no se ha
+ejecutado.
+"""
+import asyncio
+import os
+import sys
+import time
+import uuid
+
+STUB_PORT = int(os.getenv("STUB_CATALOG_PORT", 8102))
+# Antes de importar la aplicación, que lee la configuración al importarse
+os.environ["QUERY_DETECTOR"] = "strict"
+os.environ["PRODUCT_API_URL"] = f"http://127.0.0.1:{STUB_PORT}/products"
+
+import settings  # noqa: F401  (.env no sobrescribe las dos variables anteriores)
+from fastapi.testclient import TestClient
+from sqlmodel import Session, select
+
+from auth.principal_cache import PRINCIPAL_CACHE_KEY
+from auth.redis_client import client_redis
+from benchmarks.run import start_server, wait_until_ready
+from crud.user import create_user, delete_user
+from db.database import engine
+from main import app
+from models.user import User
+from services.query_detector import QueryBudgetExceeded
+from services.response_cache import RESPONSE_CACHE_KEY
+
+PASSWORD = "Budget-check1!"
+NEW_PASSWORD = "Budget-check2!"
+
+
+class BudgetCheck:
+    def __init__(self, client: TestClient):
+        self.client = client
+        self.checked = set()
+        self.failures = []
+
+    def _cold_caches(self):
+        for prefix in (PRINCIPAL_CACHE_KEY, RESPONSE_CACHE_KEY):
+            keys = list(client_redis.scan_iter(match=f"{prefix}:*", count=1000))
+            if keys:
+                client_redis.delete(*keys)
+
+    def call(self, route: str, url: str, token: str = None, expected=(200,), **kwargs):
+        """`route` es "MÉTODO plantilla", como en app.routes, para saber qué rutas se han cubierto."""
+        method = route.split(" ", 1)[0]
+        self.checked.add(route)
+        self._cold_caches()
+        headers = {"Authorization": f"Bearer {token}"} if token else {}
+        try:
+            response = self.client.request(method, url, headers=headers, follow_redirects=False, **kwargs)
+        except QueryBudgetExceeded as e:
+            self.failures.append(f"{route}: {e}")
+            return None
+        except Exception as e:
+            self.failures.append(f"{route}: {type(e).__name__}: {e}")
+            return None
+        if response.status_code not in expected:
+            self.failures.append(f"{route}: unexpected status {response.status_code}: {response.text[:200]}")
+        return response
+
+
+def budgeted_routes() -> set[str]:
+    return {
+        f"{method} {route.path}"
+        for route in app.routes
+        if getattr(getattr(route, "endpoint", None), "query_budget", None) is not None
+        for method in route.methods
+    }
+
+def user_id(username: str) -> int:
+    with Session(engine) as session:
+        return session.exec(select(User.id).where(User.username == username)).one()
+
+def login(check: BudgetCheck, username: str, password: str) -> dict:
+    response = check.call("POST /api/auth/login", "/api/auth/login", data={"username": username, "password": password})
+    return response.json() if response is not None and response.status_code == 200 else {}
+
+def run(check: BudgetCheck, suffix: str):
+    admin = f"budget_admin_{suffix}"
+    client = f"budget_client_{suffix}"
+    other = f"budget_other_{suffix}"
+    client_email = f"{client}@example.com"
+
+    # Auth
+    check.call("POST /api/auth/register", "/api/auth/register", json={
+        "username": client, "email": client_email, "password": PASSWORD, "role": "client"
+    })
+    admin_tokens = login(check, admin, PASSWORD)
+    admin_token = admin_tokens.get("access_token")
+    check.call("POST /api/auth/refresh", "/api/auth/refresh", params={"refresh_token": admin_tokens.get("refresh_token")})
+    check.call("GET /api/auth/forgot-password", "/api/auth/forgot-password")
+    response = check.call("POST /api/auth/forgot-password", "/api/auth/forgot-password", data={"email": client_email})
+    reset_token = response.json()["token"] if response is not None and response.status_code == 200 else ""
+    check.call("POST /api/auth/reset-password", "/api/auth/reset-password", expected=(303,), data={
+        "token": reset_token, "new_password": PASSWORD
+    })
+    client_token = login(check, client, PASSWORD).get("access_token")
+    check.call("POST /api/auth/change-password", "/api/auth/change-password", token=client_token, data={
+        "current_password": PASSWORD, "new_password": NEW_PASSWORD
+    })
+    check.call("GET /api/auth/revoked-tokens", "/api/auth/revoked-tokens", token=admin_token)
+
+    # Usuarios
+    check.call("POST /api/users/", "/api/users/", token=admin_token, json={
+        "username": other, "email": f"{other}@example.com", "password": PASSWORD, "role": "client"
+    })
+    other_id = user_id(other)
+    check.call("GET /api/users/", "/api/users/", token=admin_token, params={"username": other})
+    check.call("PUT /api/users/{user_id}", f"/api/users/{other_id}", token=admin_token, json={
+        "username": other, "email": f"{other}@example.com", "password": NEW_PASSWORD, "role": "client"
+    })
+
+    # Pedidos
+    client_id = user_id(client)
+    response = check.call("POST /api/orders/", "/api/orders/", token=admin_token, json={"owner_id": client_id})
+    order_id = response.json()["id"] if response is not None and response.status_code == 200 else 0
+    check.call("GET /api/orders/", "/api/orders/", token=admin_token, params={"owner_id": client_id})
+    check.call("PUT /api/orders/{order_id}", f"/api/orders/{order_id}", token=admin_token, json={"owner_id": client_id})
+
+    # Ítems
+    check.call("POST /api/items/add_item", "/api/items/add_item", token=admin_token, json={
+        "item_id": 1, "order_id": order_id, "quantity": 1
+    })
+    check.call("POST /api/items/add_items", "/api/items/add_items", token=admin_token, json={
+        "order_id": order_id, "items": [{"item_id": 2, "quantity": 1}, {"item_id": 3, "quantity": 2}]
+    })
+    check.call("GET /api/items/", "/api/items/", token=admin_token, params={"order_id": order_id})
+    check.call("PUT /api/items/{item_id}", "/api/items/1", token=admin_token, params={"order_id": order_id}, json={
+        "new_quantity": 2
+    })
+    check.call("DELETE /api/items/{item_id}", "/api/items/2", token=admin_token, params={"order_id": order_id})
+
+    # Informes
+    report_params = {"order_id": order_id}
+    check.call("GET /api/report/excel", "/api/report/excel", token=admin_token, params=report_params)
+    check.call("GET /api/report/csv", "/api/report/csv", token=admin_token, params=report_params)
+    check.call("GET /api/report/csv", "/api/report/csv", token=admin_token, params={**report_params, "stream": True})
+    check.call("GET /api/report/pdf", "/api/report/pdf", token=admin_token, params=report_params)
+    response = check.call(
+        "POST /api/report/{report_format}", "/api/report/csv", token=admin_token, expected=(202,), params=report_params
+    )
+    job_id = response.json()["job_id"] if response is not None and response.status_code == 202 else "missing"
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        response = check.call("GET /api/report/jobs/{job_id}", f"/api/report/jobs/{job_id}", token=admin_token)
+        if response is None or response.json().get("status") in ("done", "failed"):
+            break
+        time.sleep(0.2)
+    check.call("GET /api/report/jobs/{job_id}/download", f"/api/report/jobs/{job_id}/download", token=admin_token)
+
+    # Monitorización
+    check.call("GET /api/monitoring/http-pool", "/api/monitoring/http-pool", token=admin_token)
+    check.call("GET /api/monitoring/db-pool", "/api/monitoring/db-pool", token=admin_token)
+    check.call("GET /metrics", "/metrics", token=os.getenv("METRICS_TOKEN") or None)
+    check.call("GET /api/monitoring/profile", "/api/monitoring/profile", token=admin_token, params={"seconds": 0.2})
+    check.call(
+        "GET /api/monitoring/profiles/{profile_id}", "/api/monitoring/profiles/missing", token=admin_token,
+        expected=(404,)
+    )
+
+    # Borrados y cierre de sesión al final: invalidan los datos y el token de admin
+    check.call("DELETE /api/orders/{order_id}", f"/api/orders/{order_id}", token=admin_token)
+    check.call("DELETE /api/users/{user_id}", f"/api/users/{other_id}", token=admin_token)
+    revoked = login(check, client, NEW_PASSWORD).get("access_token")
+    check.call("POST /api/auth/revoke-token", "/api/auth/revoke-token", token=admin_token, data={"token": revoked})
+    check.call("POST /api/auth/logout", "/api/auth/logout", token=admin_token)
+
+def cleanup(suffix: str):
+    with Session(engine) as session:
+        users = session.exec(select(User).where(User.username.like(f"budget_%_{suffix}"))).all()
+        for user in users:
+            delete_user(session, user.id)
+
+def main():
+    stub = start_server("scripts.stub_catalog:app", STUB_PORT, {})
+    suffix = uuid.uuid4().hex[:8]
+    try:
+        asyncio.run(wait_until_ready(f"http://127.0.0.1:{STUB_PORT}/stats"))
+        with Session(engine) as session:
+            create_user(session, f"budget_admin_{suffix}", f"budget_admin_{suffix}@example.com", PASSWORD, "admin")
+        # QueryBudgetExceeded llega a BudgetCheck.call en lugar de convertirse en un 500
+        with TestClient(app, raise_server_exceptions=True) as client:
+            check = BudgetCheck(client)
+            run(check, suffix)
+    finally:
+        cleanup(suffix)
+        stub.terminate()
+        stub.wait(timeout=30)
+
+    missing = budgeted_routes() - check.checked
+    for route in sorted(missing):
+        check.failures.append(f"{route}: not exercised by this check")
+    for route in sorted(check.checked):
+        print(f"{'FAIL' if any(failure.startswith(route + ':') for failure in check.failures) else 'ok  '} {route}")
+    if check.failures:
+        print("\n" + "\n".join(check.failures))
+        sys.exit(1)
+    print(f"\nAll {len(check.checked)} budgeted routes are within budget.")
+
+if __name__ == "__main__":
+    main()
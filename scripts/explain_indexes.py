@@ -0,0 +1,111 @@
+"""
+Compara los planes de las consultas frecuentes antes y después de los índices
+de la migración 0002 sobre un conjunto de datos grande.
+
+    python -m scripts.explain_indexes --seed --rows 2000000
+
+Usar solo contra una base de datos de pruebas: --seed vacía las tablas y la
+comparación deshace y vuelve a aplicar la migración.
+"""
+import settings  # noqa: F401  (carga .env antes que el resto de módulos)
+import argparse
+import re
+from alembic import command
+from sqlalchemy import text
+from db.database import alembic_config, create_db_and_tables, engine
+from services.data_versions import invalidate_all_data
+
+BEFORE_REVISION = "0001"
+AFTER_REVISION = "0002"
+
+QUERIES = {
+    "item of an order (add/modify/delete)":
+        "SELECT * FROM itemsordered WHERE item_id = :item_id AND order_id = :order_id",
+    "items of an order (list/reports)":
+        "SELECT * FROM itemsordered WHERE order_id = :order_id ORDER BY id LIMIT 100",
+    "orders of a user (list)":
+        'SELECT * FROM "order" WHERE owner_id = :owner_id ORDER BY created_at, id LIMIT 100',
+}
+
+def seed(rows: int):
+    """Genera los datos en el propio servidor con generate_series (10 ítems por pedido, 10 pedidos por usuario)."""
+    orders = max(rows // 10, 1)
+    users = max(orders // 10, 1)
+    with engine.begin() as connection:
+        connection.execute(text('TRUNCATE itemsordered, product, "order", "user" RESTART IDENTITY CASCADE'))
+        connection.execute(text("""
+            INSERT INTO "user" (username, email, role, hashed_password)
+            SELECT 'user' || g, 'user' || g || '@example.com', 'client', 'x'
+            FROM generate_series(1, :users) AS g
+        """), {"users": users})
+        connection.execute(text("""
+            INSERT INTO "order" (owner_id, created_at)
+            SELECT (g - 1) % :users + 1, now() - g * interval '1 minute'
+            FROM generate_series(1, :orders) AS g
+        """), {"users": users, "orders": orders})
+        connection.execute(text("""
+            INSERT INTO product (item_id, version, content_hash, title, description, category, price, rating, brand)
+            SELECT g, 1, md5(g::text), 'product ' || g, NULL, 'stub', 10.0, 4.5, 'Stub'
+            FROM generate_series(1, 10) AS g
+        """))
+        connection.execute(text("""
+            INSERT INTO itemsordered (item_id, order_id, quantity, product_version, price)
+            SELECT (g - 1) % 10 + 1, (g - 1) / 10 + 1, 1, 1, 10.0
+            FROM generate_series(1, :rows) AS g
+        """), {"rows": orders * 10})
+    invalidate_all_data()
+    print(f"Seeded {users} users, {orders} orders, {orders * 10} items.")
+
+def sample_params() -> dict:
+    with engine.connect() as connection:
+        order_id = connection.execute(text('SELECT max(id) / 2 FROM "order"')).scalar() or 1
+        owner_id = connection.execute(text('SELECT owner_id FROM "order" WHERE id = :id'), {"id": order_id}).scalar() or 1
+        item_id = connection.execute(
+            text("SELECT item_id FROM itemsordered WHERE order_id = :id LIMIT 1"), {"id": order_id}
+        ).scalar() or 1
+    return {"order_id": order_id, "owner_id": owner_id, "item_id": item_id}
+
+def explain_all(params: dict) -> dict:
+    results = {}
+    with engine.connect() as connection:
+        connection.execute(text("ANALYZE"))
+        for name, query in QUERIES.items():
+            used = {key: value for key, value in params.items() if f":{key}" in query}
+            plan = connection.execute(text(f"EXPLAIN (ANALYZE, BUFFERS) {query}"), used).scalars().all()
+            match = re.search(r"Execution Time: ([\d.]+) ms", plan[-1])
+            results[name] = (float(match.group(1)) if match else None, plan)
+    return results
+
+def print_plans(title: str, results: dict):
+    print(f"\n===== {title} =====")
+    for name, (_, plan) in results.items():
+        print(f"\n--- {name}")
+        print("\n".join(plan))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seed", action="store_true", help="vaciar las tablas y generar datos nuevos")
+    parser.add_argument("--rows", type=int, default=2_000_000, help="número de ítems a generar con --seed")
+    args = parser.parse_args()
+
+    create_db_and_tables()
+    if args.seed:
+        seed(args.rows)
+    params = sample_params()
+
+    config = alembic_config()
+    command.downgrade(config, BEFORE_REVISION)
+    before = explain_all(params)
+    command.upgrade(config, AFTER_REVISION)
+    after = explain_all(params)
+    command.upgrade(config, "head")
+
+    print_plans(f"Before ({BEFORE_REVISION})", before)
+    print_plans(f"After ({AFTER_REVISION})", after)
+
+    print(f"\n{'query':<40} {'before ms':>12} {'after ms':>12}")
+    for name in QUERIES:
+        print(f"{name:<40} {before[name][0]:>12.3f} {after[name][0]:>12.3f}")
+
+if __name__ == "__main__":
+    main()
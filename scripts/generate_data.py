@@ -0,0 +1,165 @@
+"""
+Generador de datos sintéticos para pruebas de carga.
+
+    python -m scripts.generate_data --yes --users 100000 --orders 1000000 --items 10000000 --seed 42
+
+Vacía las tablas y las llena con COPY en una sola transacción. Con la misma
+semilla se generan exactamente los mismos datos. Los productos salen del
+catálogo stub (sin red) y todas las contraseñas comparten un hash bcrypt
+precalculado con el coste configurado (BCRYPT_ROUNDS).
+"""
+import settings  # noqa: F401  (carga .env antes que el resto de módulos)
+import argparse
+import csv
+import datetime
+import random
+import time
+from io import StringIO
+import bcrypt
+from sqlalchemy import text
+from auth.hashing import BCRYPT_ROUNDS
+from db.database import create_db_and_tables, engine
+from models.product import product_content_hash
+from scripts.stub_catalog import STUB_CATALOG_SIZE, make_product
+from services.data_versions import invalidate_all_data
+
+# Filas acumuladas antes de entregar un bloque a COPY
+COPY_BATCH_ROWS = 10_000
+# El hash se calcula una sola vez para todos los usuarios. Se usa el coste configurado
+# para que el primer login no tenga que rehacerlo (needs_rehash) y actualizar el usuario
+SEED_BCRYPT_ROUNDS = BCRYPT_ROUNDS
+# Los pedidos se reparten a lo largo del último año
+ORDERS_TIME_SPAN = datetime.timedelta(days=365)
+
+
+class RowStream:
+    """Fichero de solo lectura para COPY: cada lectura entrega el siguiente bloque de filas generado."""
+
+    def __init__(self, chunks):
+        self._chunks = chunks
+
+    def read(self, size: int = -1) -> str:
+        # psycopg2 envía lo que se devuelva, aunque supere `size`; "" marca el final
+        return next(self._chunks, "")
+
+
+def _csv_line(values) -> str:
+    buffer = StringIO()
+    csv.writer(buffer, lineterminator="\n").writerow(values)
+    return buffer.getvalue()
+
+def _batched(lines):
+    batch = []
+    for line in lines:
+        batch.append(line)
+        if len(batch) >= COPY_BATCH_ROWS:
+            yield "".join(batch)
+            batch = []
+    if batch:
+        yield "".join(batch)
+
+def user_rows(users: int, admins: int, hashed_password: str):
+    for user_id in range(1, users + 1):
+        role = "admin" if user_id <= admins else "client"
+        yield f"{user_id},user{user_id},user{user_id}@example.com,{role},{hashed_password}\n"
+
+def order_rows(rng: random.Random, orders: int, users: int, reference_date: datetime.datetime):
+    span = int(ORDERS_TIME_SPAN.total_seconds())
+    for order_id in range(1, orders + 1):
+        created_at = reference_date - datetime.timedelta(seconds=rng.randrange(span))
+        yield f"{order_id},{rng.randint(1, users)},{created_at.isoformat()}\n"
+
+def product_rows(products: int):
+    # Una sola versión de cada producto del catálogo stub
+    for product_id in range(1, products + 1):
+        product = make_product(product_id)
+        yield _csv_line([
+            product_id, 1, product_content_hash(product), product["title"], product["description"],
+            product["category"], product["price"], product["rating"], product["brand"],
+        ])
+
+def item_rows(rng: random.Random, items: int, orders: int, products: int):
+    prices = {product_id: make_product(product_id)["price"] for product_id in range(1, products + 1)}
+
+    # Reparto uniforme: cada pedido recibe items // orders ítems distintos (más uno los primeros)
+    base, extra = divmod(items, orders)
+    item_id = 0
+    for order_id in range(1, orders + 1):
+        count = base + (1 if order_id <= extra else 0)
+        for product_id in rng.sample(range(1, products + 1), count):
+            item_id += 1
+            yield f"{item_id},{product_id},{order_id},{rng.randint(1, 5)},1,{prices[product_id]}\n"
+
+def _copy(cursor, table: str, columns: str, rows):
+    started = time.perf_counter()
+    cursor.copy_expert(f"COPY {table} ({columns}) FROM STDIN WITH (FORMAT csv)", RowStream(_batched(rows)))
+    print(f"  {table}: {cursor.rowcount} rows in {time.perf_counter() - started:.1f}s")
+
+def _reset_sequence(cursor, table: str):
+    cursor.execute(
+        f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), COALESCE((SELECT MAX(id) FROM {table}), 0) + 1, false)"
+    )
+
+def generate(users: int, orders: int, items: int, seed: int, products: int, admins: int, password: str):
+    if items > orders * products:
+        raise ValueError(f"Cannot place {items} distinct items in {orders} orders with {products} products.")
+
+    rng = random.Random(seed)
+    hashed_password = bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt(rounds=SEED_BCRYPT_ROUNDS)).decode("utf-8")
+    # Fecha de referencia fija para que la semilla determine también created_at
+    reference_date = datetime.datetime(2025, 1, 1)
+
+    create_db_and_tables()
+    connection = engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        cursor.execute("SET LOCAL synchronous_commit = off")
+        cursor.execute('TRUNCATE itemsordered, product, "order", "user" RESTART IDENTITY CASCADE')
+        _copy(cursor, '"user"', "id, username, email, role, hashed_password", user_rows(users, admins, hashed_password))
+        _copy(cursor, '"order"', "id, owner_id, created_at", order_rows(rng, orders, users, reference_date))
+        _copy(
+            cursor, "product",
+            "item_id, version, content_hash, title, description, category, price, rating, brand",
+            product_rows(products)
+        )
+        _copy(
+            cursor, "itemsordered",
+            "id, item_id, order_id, quantity, product_version, price",
+            item_rows(rng, items, orders, products)
+        )
+        for table in ('"user"', '"order"', "itemsordered"):
+            _reset_sequence(cursor, table)
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        connection.close()
+
+    with engine.connect() as analyze_connection:
+        analyze_connection.execution_options(isolation_level="AUTOCOMMIT").execute(text("ANALYZE"))
+    # Las respuestas, los informes y los principales cacheados dejan de ser válidos
+    invalidate_all_data()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=1_000)
+    parser.add_argument("--orders", type=int, default=10_000)
+    parser.add_argument("--items", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--products", type=int, default=STUB_CATALOG_SIZE, help="productos del catálogo stub")
+    parser.add_argument("--admins", type=int, default=1, help="los primeros N usuarios son admin")
+    parser.add_argument("--password", default="password", help="contraseña de todos los usuarios")
+    parser.add_argument("--yes", action="store_true", help="confirmar que se vacían las tablas")
+    args = parser.parse_args()
+
+    if not args.yes:
+        parser.error("This replaces all users, orders and items; pass --yes to confirm.")
+
+    started = time.perf_counter()
+    print(f"Generating {args.users} users, {args.orders} orders, {args.items} items (seed {args.seed})...")
+    generate(args.users, args.orders, args.items, args.seed, args.products, args.admins, args.password)
+    print(f"Done in {time.perf_counter() - started:.1f}s")
+
+if __name__ == "__main__":
+    main()
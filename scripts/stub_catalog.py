@@ -0,0 +1,47 @@
+"""
+Servidor stub del catálogo de productos para pruebas locales.
+
+    uvicorn scripts.stub_catalog:app --port 8001
+    PRODUCT_API_URL=http://localhost:8001/products uvicorn main:app
+"""
+import asyncio
+import os
+import random
+
+from fastapi import FastAPI, HTTPException
+
+STUB_CATALOG_SIZE = int(os.getenv("STUB_CATALOG_SIZE", 194))
+STUB_CATALOG_LATENCY_MS = int(os.getenv("STUB_CATALOG_LATENCY_MS", 0))
+
+CATEGORIES = ["beauty", "fragrances", "furniture", "groceries", "laptops", "smartphones", "sports-accessories"]
+BRANDS = ["Essence", "Glamour Beauty", "Velvet Touch", "Chic Cosmetics", "Annibale Colombo", "Apple", "Samsung"]
+
+app = FastAPI()
+stats = {"requests": 0}
+
+def make_product(product_id: int) -> dict:
+    """Genera un producto determinista con el mismo formato que dummyjson."""
+    rng = random.Random(product_id)
+    category = rng.choice(CATEGORIES)
+    return {
+        "id": product_id,
+        "title": f"{category.title()} product {product_id}",
+        "description": f"Stub description for product {product_id} in category {category}.",
+        "category": category,
+        "price": round(rng.uniform(1, 2000), 2),
+        "rating": round(rng.uniform(1, 5), 2),
+        "brand": rng.choice(BRANDS),
+    }
+
+@app.get("/products/{product_id}")
+async def read_product(product_id: int):
+    stats["requests"] += 1
+    if STUB_CATALOG_LATENCY_MS:
+        await asyncio.sleep(STUB_CATALOG_LATENCY_MS / 1000)
+    if not 1 <= product_id <= STUB_CATALOG_SIZE:
+        raise HTTPException(status_code=404, detail=f"Product with id '{product_id}' not found")
+    return make_product(product_id)
+
+@app.get("/stats")
+def read_stats():
+    return stats
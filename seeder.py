@@ -1,3 +1,4 @@
+import settings  # noqa: F401  (carga .env antes que el resto de módulos)
 import asyncio
 from sqlmodel import Session, select
 from auth.hashing import hash_password
@@ -5,6 +6,7 @@ from db.database import engine, create_db_and_tables, drop_db_and_tables
 from models.user import User
 from models.order import Order
 from crud.items_ordered import add_item_ordered
+from services.data_versions import invalidate_all_data
 # from auth.hashing import hash_password  # Importamos la función para hashear contraseñas
 
 async def seed_data():
@@ -78,6 +80,9 @@ async def seed_data():
         except Exception as e:
             print(f"Error creating items: {e}")
 
+    # Los ids vuelven a empezar: lo cacheado de la base de datos anterior ya no vale
+    invalidate_all_data()
+
 if __name__ == "__main__":
     asyncio.run(seed_data())
     print("Seeding completed.")
\ No newline at end of file
@@ -0,0 +1,34 @@
+from logging import getLogger
+from redis import RedisError
+from auth.principal_cache import clear_principals
+from auth.redis_client import client_redis
+
+logger = getLogger(__name__)
+
+DATA_VERSION_KEY = "DATA_VERSION"
+
+def order_entity(order_id: int) -> str:
+    return f"order:{order_id}"
+
+def bump_versions(*entities: str):
+    """Incrementa el contador de versión de cada entidad modificada."""
+    try:
+        pipeline = client_redis.pipeline(transaction=False)
+        for entity in entities:
+            pipeline.incr(f"{DATA_VERSION_KEY}:{entity}")
+        pipeline.execute()
+    except RedisError as e:
+        logger.warning(f"Could not bump data versions {entities}: {e}")
+
+def invalidate_all_data():
+    """
+    Tras vaciar o regenerar las tablas: invalida todas las respuestas e informes
+    cacheados (los ids se reinician, así que un ETag antiguo podría coincidir)
+    y los principales de usuarios que ya no existen.
+    """
+    bump_versions("users", "orders", "items")
+    clear_principals()
+
+def get_versions(*entities: str) -> list[int]:
+    values = client_redis.mget([f"{DATA_VERSION_KEY}:{entity}" for entity in entities])
+    return [int(value or 0) for value in values]
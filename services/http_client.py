@@ -0,0 +1,105 @@
+import asyncio
+import os
+import random
+from logging import getLogger
+
+import httpx
+
+logger = getLogger(__name__)
+
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", 100))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", 20))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", 30))
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", 10))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", 5))
+HTTP_POOL_TIMEOUT = float(os.getenv("HTTP_POOL_TIMEOUT", 5))
+HTTP_RETRIES = int(os.getenv("HTTP_RETRIES", 2))
+HTTP_BACKOFF = float(os.getenv("HTTP_BACKOFF", 0.2))
+HTTP_VERIFY_SSL = os.getenv("HTTP_VERIFY_SSL", "no").lower() == "yes"
+
+RETRY_STATUS_CODES = {502, 503, 504}
+
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+pool_stats = {
+    "requests": 0,
+    "in_flight": 0,
+    "peak_in_flight": 0,
+    "saturated": 0,
+    "retries": 0,
+    "errors": 0,
+}
+
+_client: httpx.AsyncClient | None = None
+
+
+def create_http_client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        http2=HTTP2_AVAILABLE,
+        verify=HTTP_VERIFY_SSL,
+        limits=httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+        ),
+        timeout=httpx.Timeout(HTTP_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT, pool=HTTP_POOL_TIMEOUT),
+    )
+
+async def start_http_client():
+    global _client
+    if _client is None:
+        _client = create_http_client()
+
+async def close_http_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+def get_http_client() -> httpx.AsyncClient:
+    """Dependencia que devuelve el cliente HTTP compartido de la aplicación."""
+    global _client
+    if _client is None:
+        # Fuera de la app (seeder, scripts) se crea bajo demanda
+        _client = create_http_client()
+    return _client
+
+def get_pool_stats() -> dict:
+    return {
+        **pool_stats,
+        "max_connections": HTTP_MAX_CONNECTIONS,
+        "max_keepalive_connections": HTTP_MAX_KEEPALIVE,
+        "http2": HTTP2_AVAILABLE,
+    }
+
+async def request_with_retry(client: httpx.AsyncClient, method: str, url: str, **kwargs) -> httpx.Response:
+    """
+    Ejecuta una petición reintentando errores de red y respuestas 502/503/504
+    con backoff exponencial y jitter.
+    """
+    attempt = 0
+    while True:
+        pool_stats["requests"] += 1
+        if pool_stats["in_flight"] >= HTTP_MAX_CONNECTIONS:
+            pool_stats["saturated"] += 1
+        pool_stats["in_flight"] += 1
+        pool_stats["peak_in_flight"] = max(pool_stats["peak_in_flight"], pool_stats["in_flight"])
+        try:
+            response = await client.request(method, url, **kwargs)
+            if response.status_code not in RETRY_STATUS_CODES or attempt >= HTTP_RETRIES:
+                return response
+        except httpx.TransportError as e:
+            if attempt >= HTTP_RETRIES:
+                pool_stats["errors"] += 1
+                raise
+            logger.warning(f"Request to {url} failed ({e!r}), retrying")
+        finally:
+            pool_stats["in_flight"] -= 1
+
+        attempt += 1
+        pool_stats["retries"] += 1
+        await asyncio.sleep(HTTP_BACKOFF * 2 ** (attempt - 1) * (1 + random.random()))
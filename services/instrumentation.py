@@ -0,0 +1,182 @@
+import os
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from sqlalchemy import event
+from starlette.datastructures import MutableHeaders
+
+# Añade la cabecera Server-Timing con el desglose de cada petición
+SERVER_TIMING = os.getenv("SERVER_TIMING", "yes").lower() == "yes"
+
+DURATION_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+# Componentes medidos en cada petición, en el orden de Server-Timing
+TIMED_KINDS = ("db", "redis", "product_api", "bcrypt")
+
+
+class RequestMetrics:
+    """Tiempo acumulado y número de llamadas de cada componente durante una petición."""
+    __slots__ = ("durations", "counts")
+
+    def __init__(self):
+        self.durations = dict.fromkeys(TIMED_KINDS, 0.0)
+        self.counts = dict.fromkeys(TIMED_KINDS, 0)
+
+    def add(self, kind: str, seconds: float):
+        self.durations[kind] += seconds
+        self.counts[kind] += 1
+
+
+# Métricas de la petición en curso (None fuera de una petición: workers, hilos de fondo)
+_current: ContextVar[RequestMetrics | None] = ContextVar("request_metrics", default=None)
+
+@contextmanager
+def timed(kind: str):
+    """Suma la duración del bloque al componente `kind` de la petición actual."""
+    metrics = _current.get()
+    if metrics is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.add(kind, time.perf_counter() - started)
+
+def register_db_timing(engine):
+    """Mide cada sentencia ejecutada en `engine` dentro de la petición actual."""
+    @event.listens_for(engine, "before_cursor_execute")
+    def on_before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if _current.get() is not None:
+            context._instrumentation_started = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def on_after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        metrics = _current.get()
+        started = getattr(context, "_instrumentation_started", None)
+        if metrics is not None and started is not None:
+            metrics.add("db", time.perf_counter() - started)
+
+
+class Histogram:
+    def __init__(self, name: str, description: str, buckets: tuple, label_names: tuple):
+        self.name = name
+        self.description = description
+        self.buckets = buckets
+        self.label_names = label_names
+        # etiquetas -> [recuento por bucket..., +Inf, suma]
+        self._series: dict[tuple, list] = {}
+
+    def observe(self, labels: tuple, value: float):
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} histogram"]
+        for labels, series in self._series.items():
+            base = ",".join(f'{name}="{value}"' for name, value in zip(self.label_names, labels))
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), series):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{base},le="{bound}"}} {cumulative}')
+            lines.append(f"{self.name}_sum{{{base}}} {series[-1]}")
+            lines.append(f"{self.name}_count{{{base}}} {cumulative}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name: str, description: str, label_names: tuple):
+        self.name = name
+        self.description = description
+        self.label_names = label_names
+        self._values: dict[tuple, int] = {}
+
+    def inc(self, labels: tuple, amount: int = 1):
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} counter"]
+        for labels, value in self._values.items():
+            base = ",".join(f'{name}="{value}"' for name, value in zip(self.label_names, labels))
+            lines.append(f"{self.name}{{{base}}} {value}")
+        return lines
+
+
+ROUTE_LABELS = ("method", "route")
+
+requests_total = Counter("http_requests_total", "Peticiones atendidas.", ("method", "route", "status"))
+request_duration = Histogram(
+    "http_request_duration_seconds", "Duración total de la petición.", DURATION_BUCKETS, ROUTE_LABELS
+)
+component_durations = {
+    kind: Histogram(f"http_request_{kind}_seconds", f"Tiempo en {kind} por petición.", DURATION_BUCKETS, ROUTE_LABELS)
+    for kind in TIMED_KINDS
+}
+component_counts = {
+    "db": Histogram("http_request_db_statements", "Sentencias SQL por petición.", COUNT_BUCKETS, ROUTE_LABELS),
+    "redis": Histogram("http_request_redis_round_trips", "Llamadas a Redis por petición.", COUNT_BUCKETS, ROUTE_LABELS),
+}
+
+def render_metrics() -> str:
+    """Métricas de este worker en formato de texto de Prometheus."""
+    families = [requests_total, request_duration, *component_durations.values(), *component_counts.values()]
+    return "\n".join(line for family in families for line in family.render()) + "\n"
+
+def server_timing(metrics: RequestMetrics, total: float) -> str:
+    entries = [f"app;dur={total * 1000:.2f}"]
+    for kind in TIMED_KINDS:
+        entry = f"{kind.replace('_', '-')};dur={metrics.durations[kind] * 1000:.2f}"
+        if kind in component_counts:
+            entry += f';desc="{metrics.counts[kind]}"'
+        entries.append(entry)
+    return ", ".join(entries)
+
+
+class InstrumentationMiddleware:
+    """
+    Middleware ASGI que mide cada petición: tiempo total, tiempo y sentencias en la
+    base de datos, llamadas a Redis, tiempo en la API de productos y en bcrypt.
+    Añade la cabecera Server-Timing (con lo medido hasta que empieza la respuesta)
+    y acumula histogramas por ruta para /metrics.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if SERVER_TIMING:
+                    headers = MutableHeaders(scope=message)
+                    headers.append("Server-Timing", server_timing(metrics, time.perf_counter() - started))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            # La plantilla de la ruta (no la URL) para no crear una serie por cada id
+            route = scope.get("route")
+            labels = (scope["method"], route.path if route is not None else "unmatched")
+            requests_total.inc((*labels, str(status)))
+            request_duration.observe(labels, time.perf_counter() - started)
+            for kind, histogram in component_durations.items():
+                histogram.observe(labels, metrics.durations[kind])
+            for kind, histogram in component_counts.items():
+                histogram.observe(labels, metrics.counts[kind])
@@ -0,0 +1,127 @@
+import asyncio
+import json
+import os
+import time
+from collections import OrderedDict
+from logging import getLogger
+
+import httpx
+from redis import RedisError
+
+from auth.redis_client import client_redis
+from services.http_client import get_http_client, request_with_retry
+from services.instrumentation import timed
+
+logger = getLogger(__name__)
+
+# Catálogo externo de productos (se puede apuntar a un stub local con PRODUCT_API_URL)
+PRODUCT_API_URL = os.getenv("PRODUCT_API_URL", "https://dummyjson.com/products")
+
+PRODUCT_CACHE_SIZE = int(os.getenv("PRODUCT_CACHE_SIZE", 1024))
+PRODUCT_CACHE_TTL = int(os.getenv("PRODUCT_CACHE_TTL", 300))
+PRODUCT_CACHE_NEGATIVE_TTL = int(os.getenv("PRODUCT_CACHE_NEGATIVE_TTL", 30))
+PRODUCT_CACHE_REDIS = os.getenv("PRODUCT_CACHE_REDIS", "no").lower() == "yes"
+
+PRODUCT_CACHE_KEY = "PRODUCT_CACHE"
+NOT_FOUND = "__not_found__"
+
+
+class TTLCache:
+    """LRU en memoria con caducidad por entrada."""
+
+    def __init__(self, maxsize: int, ttl: int):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+
+    def get(self, key):
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key, value, ttl: int = None):
+        self._data[key] = (time.monotonic() + (ttl or self.ttl), value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def clear(self):
+        self._data.clear()
+
+
+_local_cache = TTLCache(PRODUCT_CACHE_SIZE, PRODUCT_CACHE_TTL)
+_inflight: dict[int, asyncio.Task] = {}
+
+
+def _redis_get(product_id: int):
+    try:
+        value = client_redis.get(f"{PRODUCT_CACHE_KEY}:{product_id}")
+    except RedisError as e:
+        logger.warning(f"Product cache read failed for product {product_id}: {e}")
+        return None
+    if value is None:
+        return None
+    return NOT_FOUND if value == NOT_FOUND else json.loads(value)
+
+def _redis_set(product_id: int, value, ttl: int):
+    payload = value if value == NOT_FOUND else json.dumps(value)
+    try:
+        client_redis.setex(f"{PRODUCT_CACHE_KEY}:{product_id}", ttl, payload)
+    except RedisError as e:
+        logger.warning(f"Product cache write failed for product {product_id}: {e}")
+
+def _store(product_id: int, value):
+    ttl = PRODUCT_CACHE_NEGATIVE_TTL if value == NOT_FOUND else PRODUCT_CACHE_TTL
+    _local_cache.set(product_id, value, ttl)
+    return ttl
+
+async def _fetch_product(product_id: int, client: httpx.AsyncClient):
+    with timed("product_api"):
+        response = await request_with_retry(client, "GET", f"{PRODUCT_API_URL}/{product_id}")
+    if response.status_code == 404:
+        return NOT_FOUND
+    if response.status_code != 200:
+        # Errores del upstream no se cachean para no fijar un fallo temporal
+        raise ValueError(f"Product with id {product_id} not found in API.")
+    return response.json()
+
+async def _load_product(product_id: int, client: httpx.AsyncClient):
+    if PRODUCT_CACHE_REDIS:
+        value = await asyncio.to_thread(_redis_get, product_id)
+        if value is not None:
+            _store(product_id, value)
+            return value
+
+    value = await _fetch_product(product_id, client)
+    ttl = _store(product_id, value)
+    if PRODUCT_CACHE_REDIS:
+        await asyncio.to_thread(_redis_set, product_id, value, ttl)
+    return value
+
+async def get_product(product_id: int, client: httpx.AsyncClient = None) -> dict:
+    """
+    Devuelve los datos de un producto del catálogo externo.
+    Consulta primero la caché local, después Redis (si está activado) y por último la API.
+    Las peticiones concurrentes para el mismo producto comparten una única llamada a la API.
+    """
+    value = _local_cache.get(product_id)
+    if value is None:
+        task = _inflight.get(product_id)
+        if task is None:
+            task = asyncio.ensure_future(_load_product(product_id, client or get_http_client()))
+            _inflight[product_id] = task
+            task.add_done_callback(lambda _: _inflight.pop(product_id, None))
+        value = await asyncio.shield(task)
+
+    if value == NOT_FOUND:
+        raise ValueError(f"Product with id {product_id} not found in API.")
+    return value
+
+def clear_product_cache():
+    _local_cache.clear()
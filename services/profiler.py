@@ -0,0 +1,175 @@
+import asyncio
+import json
+import os
+import secrets
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from logging import getLogger
+from redis import RedisError
+from starlette.datastructures import MutableHeaders
+
+from auth.redis_client import client_redis
+
+# Límite de un perfil (endpoint o petición) y frecuencia de muestreo por defecto
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", 30))
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", 10))
+# Token de la cabecera X-Profile-Token que activa el perfil de una petición (vacío: desactivado)
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN", "")
+PROFILE_TTL = int(os.getenv("PROFILE_TTL", 3600))
+PROFILE_KEY = "PROFILE"
+
+logger = getLogger(__name__)
+
+# Un único perfil a la vez por worker: cada muestra recorre todos los hilos
+_profiling = threading.Lock()
+
+
+class StackSampler:
+    """
+    Muestrea las pilas de todos los hilos del proceso con sys._current_frames
+    desde un hilo propio y las acumula en formato colapsado ("hilo;f1;f2" -> muestras).
+    """
+
+    def __init__(self, interval: float, max_seconds: float = PROFILE_MAX_SECONDS):
+        self.interval = interval
+        self.max_seconds = max_seconds
+        self.samples = Counter()
+        self._labels = {}
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+
+    def _label(self, code) -> str:
+        label = self._labels.get(code)
+        if label is None:
+            label = self._labels[code] = f"{code.co_qualname} ({code.co_filename}:{code.co_firstlineno})"
+        return label
+
+    def _sample(self):
+        own = threading.get_ident()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == own:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(self._label(frame.f_code))
+                frame = frame.f_back
+            stack.append(names.get(ident, str(ident)))
+            self.samples[";".join(reversed(stack))] += 1
+
+    def _run(self):
+        try:
+            deadline = time.monotonic() + self.max_seconds
+            while time.monotonic() < deadline:
+                self._sample()
+                if self._stopped.wait(self.interval):
+                    break
+        finally:
+            _profiling.release()
+
+    def stop(self) -> Counter:
+        self._stopped.set()
+        self._thread.join()
+        return self.samples
+
+
+def start_sampler(interval: float, max_seconds: float = PROFILE_MAX_SECONDS) -> StackSampler | None:
+    """Arranca un muestreo del worker; None si ya hay otro en curso."""
+    if not _profiling.acquire(blocking=False):
+        return None
+    sampler = StackSampler(interval, max_seconds)
+    try:
+        sampler._thread.start()
+    except BaseException:
+        _profiling.release()
+        raise
+    return sampler
+
+def collapsed(samples: Counter) -> str:
+    """Formato de flamegraph.pl / inferno: una pila por línea seguida del número de muestras."""
+    return "".join(f"{stack} {count}\n" for stack, count in samples.most_common())
+
+def speedscope(samples: Counter, interval: float, name: str) -> dict:
+    frames, index = [], {}
+    stacks, weights = [], []
+    for stack, count in samples.items():
+        ids = []
+        for frame in stack.split(";"):
+            if frame not in index:
+                index[frame] = len(frames)
+                frames.append({"name": frame})
+            ids.append(index[frame])
+        stacks.append(ids)
+        weights.append(count * interval * 1000)
+    return {
+        "$schema": "https://www.speedscope.app/file-format-schema.json",
+        "name": name,
+        "shared": {"frames": frames},
+        "profiles": [{
+            "type": "sampled",
+            "name": name,
+            "unit": "milliseconds",
+            "startValue": 0,
+            "endValue": sum(weights),
+            "samples": stacks,
+            "weights": weights,
+        }],
+    }
+
+def save_profile(profile_id: str, samples: Counter, interval: float, name: str):
+    payload = json.dumps({"name": name, "interval": interval, "samples": samples})
+    client_redis.set(f"{PROFILE_KEY}:{profile_id}", payload, ex=PROFILE_TTL)
+
+def load_profile(profile_id: str) -> tuple[Counter, float, str] | None:
+    payload = client_redis.get(f"{PROFILE_KEY}:{profile_id}")
+    if payload is None:
+        return None
+    profile = json.loads(payload)
+    return Counter(profile["samples"]), profile["interval"], profile["name"]
+
+
+class ProfileRequestMiddleware:
+    """
+    Perfila las peticiones que traen la cabecera X-Profile-Token con PROFILE_TOKEN.
+    Se muestrea todo el worker mientras dura la petición (incluido el envío del cuerpo);
+    la respuesta lleva X-Profile-Id para descargar el perfil desde /api/monitoring/profiles.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    def _requested(self, scope) -> bool:
+        for name, value in scope["headers"]:
+            if name == b"x-profile-token" and PROFILE_TOKEN:
+                return secrets.compare_digest(value, PROFILE_TOKEN.encode())
+        return False
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self._requested(scope):
+            await self.app(scope, receive, send)
+            return
+
+        interval = PROFILE_INTERVAL_MS / 1000
+        sampler = start_sampler(interval)
+        if sampler is None:
+            await self.app(scope, receive, send)
+            return
+        profile_id = uuid.uuid4().hex
+
+        async def send_with_profile_id(message):
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message).append("X-Profile-Id", profile_id)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            samples = await asyncio.to_thread(sampler.stop)
+            name = f"{scope['method']} {scope['path']}"
+            try:
+                await asyncio.to_thread(save_profile, profile_id, samples, interval, name)
+            except RedisError as e:
+                logger.warning(f"Could not store profile {profile_id}: {e}")
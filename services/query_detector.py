@@ -0,0 +1,124 @@
+import os
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from logging import getLogger
+from sqlalchemy import event
+
+logger = getLogger(__name__)
+
+# off | warn (solo avisa en el log) | strict (además lanza QueryBudgetExceeded; para tests y staging)
+QUERY_DETECTOR = os.getenv("QUERY_DETECTOR", "off").lower()
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", 200))
+# Veces que puede repetirse la misma sentencia en una petición antes de sospechar un N+1
+REPEATED_QUERY_THRESHOLD = int(os.getenv("REPEATED_QUERY_THRESHOLD", 3))
+
+class QueryBudgetExceeded(AssertionError):
+    """Una petición ha ejecutado más sentencias SQL de las declaradas con query_budget."""
+
+_PARAMETER = re.compile(r"(?:%\(\w+\)s|\$\d+)(?:::\w+(?:\[\])?)?")
+_PARAMETER_LIST = re.compile(r"\?(?:\s*,\s*\?)+")
+_ROW_LIST = re.compile(r"\(\?\)(?:\s*,\s*\(\?\))+")
+
+def statement_shape(statement: str) -> str:
+    """Sentencia sin parámetros, con las listas de IN y VALUES colapsadas."""
+    shape = _PARAMETER.sub("?", statement)
+    shape = _PARAMETER_LIST.sub("?", shape)
+    return " ".join(_ROW_LIST.sub("(?)", shape).split())
+
+
+class QueryLog:
+    """Sentencias ejecutadas dentro de una petición (o de un bloque track_queries)."""
+
+    def __init__(self, label: str, budget: int | None = None):
+        self.label = label
+        self.budget = budget
+        self.count = 0
+        self.shapes = Counter()
+        self.slow = []
+
+    def repeated(self) -> list[tuple[str, int]]:
+        return [(shape, times) for shape, times in self.shapes.most_common() if times >= REPEATED_QUERY_THRESHOLD]
+
+    def check(self):
+        for shape, times in self.repeated():
+            logger.warning(f"Possible N+1 in {self.label}: statement executed {times} times: {shape}")
+        if self.budget is not None and self.count > self.budget:
+            message = f"{self.label} executed {self.count} SQL statements, budget is {self.budget}"
+            if QUERY_DETECTOR == "strict":
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+
+
+_current: ContextVar[QueryLog | None] = ContextVar("query_log", default=None)
+
+@contextmanager
+def track_queries(label: str, budget: int | None = None):
+    """
+    Registra las sentencias del bloque y comprueba el presupuesto al salir.
+    También sirve en los tests para acotar una función de crud:
+
+        with track_queries("get_items_ordered", budget=2):
+            get_items_ordered(session, order_id=1)
+    """
+    log = QueryLog(label, budget)
+    token = _current.set(log)
+    try:
+        yield log
+    finally:
+        _current.reset(token)
+    log.check()
+
+def query_budget(statements: int):
+    """Declara el máximo de sentencias SQL de una ruta (se coloca debajo del decorador del router)."""
+    def decorator(endpoint):
+        endpoint.query_budget = statements
+        return endpoint
+    return decorator
+
+def register_query_detector(engine):
+    """Cuenta y cronometra las sentencias de `engine` dentro de track_queries."""
+    @event.listens_for(engine, "before_cursor_execute")
+    def on_before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if _current.get() is not None:
+            context._detector_started = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def on_after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        log = _current.get()
+        started = getattr(context, "_detector_started", None)
+        if log is None or started is None:
+            return
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        shape = statement_shape(statement)
+        log.count += 1
+        log.shapes[shape] += 1
+        if elapsed_ms > SLOW_QUERY_MS:
+            log.slow.append((elapsed_ms, shape))
+            logger.warning(f"Slow query in {log.label} ({elapsed_ms:.1f} ms): {shape}")
+
+
+class QueryDetectorMiddleware:
+    """
+    Middleware ASGI que registra las sentencias de cada petición y, al terminar,
+    avisa de las repetidas y de las lentas y comprueba el presupuesto de la ruta.
+    En modo strict un presupuesto superado lanza QueryBudgetExceeded, que el
+    TestClient propaga al test.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        with track_queries(f"{scope['method']} {scope['path']}") as log:
+            await self.app(scope, receive, send)
+            route = scope.get("route")
+            if route is not None:
+                log.label = f"{scope['method']} {route.path}"
+                log.budget = getattr(route.endpoint, "query_budget", None)
@@ -0,0 +1,152 @@
+import hashlib
+import json
+import multiprocessing
+import os
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from logging import getLogger
+from pathlib import Path
+from sqlmodel import Session
+from auth.redis_client import client_redis
+from crud.report_data import report_statement
+from crud.report import REPORT_FORMATS, write_report
+from db.database import engine
+from services.data_versions import get_versions, order_entity
+
+logger = getLogger(__name__)
+
+REPORT_CACHE_DIR = Path(os.getenv("REPORT_CACHE_DIR", "report_cache"))
+REPORT_CACHE_TTL = int(os.getenv("REPORT_CACHE_TTL", 86400))
+# Tamaño máximo de la caché de informes; al superarlo se borran los más antiguos
+REPORT_CACHE_MAX_MB = int(os.getenv("REPORT_CACHE_MAX_MB", 1024))
+REPORT_WORKERS = int(os.getenv("REPORT_WORKERS", 2))
+REPORT_JOB_TTL = int(os.getenv("REPORT_JOB_TTL", 3600))
+
+REPORT_JOB_KEY = "REPORT_JOB"
+REPORT_INFLIGHT_KEY = "REPORT_INFLIGHT"
+
+_executor: ProcessPoolExecutor | None = None
+
+def _prune_artifacts():
+    """Borra los artefactos caducados y, si la caché supera REPORT_CACHE_MAX_MB, los más antiguos."""
+    now = time.time()
+    artifacts = []
+    for path in REPORT_CACHE_DIR.glob("*"):
+        try:
+            stat = path.stat()
+        except FileNotFoundError:  # Borrado por otro proceso
+            continue
+        if now - stat.st_mtime > REPORT_CACHE_TTL:
+            path.unlink(missing_ok=True)
+        elif path.suffix != ".tmp":  # Los temporales son de trabajos en curso
+            artifacts.append((stat.st_mtime, stat.st_size, path))
+
+    total = sum(size for _, size, _ in artifacts)
+    limit = REPORT_CACHE_MAX_MB * 1024 * 1024
+    for _, size, path in sorted(artifacts):
+        if total <= limit:
+            break
+        path.unlink(missing_ok=True)
+        total -= size
+
+def start_report_workers():
+    global _executor
+    if _executor is None:
+        REPORT_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        _prune_artifacts()
+        # spawn y no fork: el worker de uvicorn ya tiene hilos (bcrypt, Redis, profiler) y
+        # conexiones abiertas, y un fork podría bloquear a los hijos o compartir sockets
+        _executor = ProcessPoolExecutor(max_workers=REPORT_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+
+def stop_report_workers():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+def artifact_path(artifact: str, report_format: str) -> Path:
+    return REPORT_CACHE_DIR / f"{artifact}.{REPORT_FORMATS[report_format][2]}"
+
+def _artifact_key(report_format: str, params: dict, versions: list[int]) -> str:
+    data = json.dumps({"format": report_format, "params": params, "versions": versions}, sort_keys=True)
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+def _is_fresh(path: Path) -> bool:
+    return path.exists() and time.time() - path.stat().st_mtime < REPORT_CACHE_TTL
+
+def _save_job(job_id: str, **fields):
+    pipeline = client_redis.pipeline()
+    pipeline.hset(f"{REPORT_JOB_KEY}:{job_id}", mapping={key: str(value) for key, value in fields.items()})
+    pipeline.expire(f"{REPORT_JOB_KEY}:{job_id}", REPORT_JOB_TTL)
+    pipeline.execute()
+
+def get_job(job_id: str) -> dict | None:
+    job = client_redis.hgetall(f"{REPORT_JOB_KEY}:{job_id}")
+    return job or None
+
+def _run_job(job_id: str, report_format: str, params: dict, path: str, inflight_key: str):
+    """Se ejecuta en un proceso del pool: genera el informe y lo deja en la caché."""
+    _save_job(job_id, status="running")
+    tmp_path = f"{path}.{job_id}.tmp"
+    try:
+        with Session(engine) as session:
+            statement = report_statement(session, **params)
+            write_report(report_format, session, statement, tmp_path)
+        os.replace(tmp_path, path)
+        _save_job(job_id, status="done")
+        # Cada cambio en los datos genera artefactos nuevos: se poda tras cada informe
+        try:
+            _prune_artifacts()
+        except OSError as e:
+            logger.warning(f"Could not prune report cache: {e}")
+    except Exception as e:
+        logger.exception(f"Report job {job_id} failed")
+        _save_job(job_id, status="failed", error=str(e))
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    finally:
+        client_redis.delete(inflight_key)
+
+def submit_report_job(session: Session, report_format: str, params: dict, owner_id: int) -> dict:
+    """
+    Encola la generación de un informe y devuelve el trabajo creado.
+    Si ya existe un artefacto para los mismos filtros y la misma versión de los datos,
+    el trabajo se devuelve terminado sin volver a generarlo.
+    """
+    # Validar los filtros (p. ej. usuario sin pedidos) antes de encolar
+    report_statement(session, **params)
+
+    # Los informes de un pedido dependen también de "orders": borrar un usuario elimina
+    # sus pedidos en cascada sin incrementar la versión de cada uno
+    scope = (order_entity(params["order_id"]), "orders") if params.get("order_id") is not None else ("items",)
+    artifact = _artifact_key(report_format, params, get_versions(*scope))
+    path = artifact_path(artifact, report_format)
+    job = {"format": report_format, "artifact": artifact, "owner_id": owner_id, "created_at": int(time.time())}
+
+    job_id = uuid.uuid4().hex
+    if _is_fresh(path):
+        _save_job(job_id, status="done", cached=1, **job)
+        return {"job_id": job_id, "status": "done"}
+
+    # Un mismo usuario que repite la petición mientras se genera recibe el trabajo en curso
+    inflight_key = f"{REPORT_INFLIGHT_KEY}:{owner_id}:{artifact}"
+    if not client_redis.set(inflight_key, job_id, nx=True, ex=REPORT_JOB_TTL):
+        running_job_id = client_redis.get(inflight_key)
+        running_job = get_job(running_job_id) if running_job_id else None
+        if running_job:
+            return {"job_id": running_job_id, "status": running_job["status"]}
+        client_redis.set(inflight_key, job_id, ex=REPORT_JOB_TTL)
+
+    _save_job(job_id, status="queued", cached=0, **job)
+    start_report_workers()
+    future = _executor.submit(_run_job, job_id, report_format, params, str(path), inflight_key)
+
+    def on_done(done_future):
+        # Fallos del propio pool (proceso caído, trabajo cancelado)
+        if done_future.cancelled() or done_future.exception() is not None:
+            _save_job(job_id, status="failed", error="Report worker failed")
+            client_redis.delete(inflight_key)
+
+    future.add_done_callback(on_done)
+    return {"job_id": job_id, "status": "queued"}
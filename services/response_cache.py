@@ -0,0 +1,99 @@
+import hashlib
+import json
+import os
+from logging import getLogger
+from urllib.parse import urlencode
+import orjson
+from fastapi import Request, Response
+from pydantic import TypeAdapter
+from redis import RedisError
+
+from auth.redis_client import client_redis
+from services.data_versions import DATA_VERSION_KEY
+
+logger = getLogger(__name__)
+
+RESPONSE_CACHE_KEY = "RESPONSE_CACHE"
+RESPONSE_CACHE_TTL = int(os.getenv("RESPONSE_CACHE_TTL", 300))
+# Listados construidos con proyecciones de columnas y orjson, sin pasar por pydantic
+FAST_LIST_RESPONSES = os.getenv("FAST_LIST_RESPONSES", "no").lower() == "yes"
+
+# El cliente debe revalidar siempre (If-None-Match) y la respuesta depende del token
+CACHE_HEADERS = {"Cache-Control": "private, no-cache", "Vary": "Authorization"}
+
+def _etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    # If-None-Match usa comparación débil: se ignora el prefijo W/
+    return "*" in candidates or etag in (candidate.removeprefix("W/") for candidate in candidates)
+
+def serialize(adapter: TypeAdapter, value) -> bytes:
+    """JSON del modelo de respuesta, igual que lo serializaría FastAPI con response_model."""
+    return adapter.dump_json(adapter.validate_python(value, from_attributes=True))
+
+def serialize_rows(rows, fields: tuple) -> bytes:
+    """
+    JSON de filas de una proyección de columnas con solo `fields` (los del modelo de
+    respuesta): sin entidades ORM ni validación. Las filas salen de la base de datos
+    con los tipos de las columnas, así que el resultado coincide con `serialize`.
+    """
+    return orjson.dumps([{field: getattr(row, field) for field in fields} for row in rows])
+
+
+class CachedResponse:
+    """
+    Caché en Redis de la respuesta de un GET para un usuario, una ruta y unos parámetros.
+    La entrada guarda los contadores de versión (services.data_versions) de las entidades
+    de las que depende y deja de valer en cuanto un mutador incrementa alguno.
+    El ETag es un hash del cuerpo, así que es fuerte: mismo ETag, mismos bytes.
+    """
+
+    def __init__(self, request: Request, principal: dict, *entities: str):
+        self.request = request
+        self.entities = entities
+        query = urlencode(sorted(request.query_params.multi_items()))
+        scope = f"{principal['id']}:{principal['role']}:{request.url.path}?{query}"
+        self.key = f"{RESPONSE_CACHE_KEY}:{hashlib.sha256(scope.encode('utf-8')).hexdigest()}"
+        self.versions = None
+
+    def lookup(self) -> Response | None:
+        """Respuesta cacheada (o 304) si los datos no han cambiado; None si hay que calcularla."""
+        try:
+            # Versiones y entrada en un solo viaje a Redis
+            pipeline = client_redis.pipeline(transaction=False)
+            pipeline.mget([f"{DATA_VERSION_KEY}:{entity}" for entity in self.entities])
+            pipeline.hgetall(self.key)
+            versions, entry = pipeline.execute()
+        except RedisError as e:
+            logger.warning(f"Response cache lookup failed for {self.request.url.path}: {e}")
+            return None
+        self.versions = json.dumps([int(version or 0) for version in versions])
+        if not entry or entry.get("versions") != self.versions:
+            return None
+        return self._response(entry["body"].encode("utf-8"), entry["etag"], json.loads(entry["headers"]))
+
+    def respond(self, body: bytes, headers: dict | None = None) -> Response:
+        """Guarda el cuerpo calculado (si se leyeron las versiones antes de consultar) y lo devuelve."""
+        headers = headers or {}
+        etag = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+        if self.versions is not None:
+            try:
+                pipeline = client_redis.pipeline(transaction=False)
+                pipeline.hset(self.key, mapping={
+                    "versions": self.versions,
+                    "etag": etag,
+                    "body": body.decode("utf-8"),
+                    "headers": json.dumps(headers),
+                })
+                pipeline.expire(self.key, RESPONSE_CACHE_TTL)
+                pipeline.execute()
+            except RedisError as e:
+                logger.warning(f"Response cache write failed for {self.request.url.path}: {e}")
+        return self._response(body, etag, headers)
+
+    def _response(self, body: bytes, etag: str, headers: dict) -> Response:
+        headers = {**headers, **CACHE_HEADERS, "ETag": etag}
+        if _etag_matches(self.request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=headers)
+        return Response(content=body, media_type="application/json", headers=headers)
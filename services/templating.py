@@ -0,0 +1,23 @@
+import os
+from fastapi.templating import Jinja2Templates
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader, select_autoescape
+
+TEMPLATES_DIR = os.getenv("TEMPLATES_DIR", "templates")
+# En desarrollo conviene recargar las plantillas al cambiar; en producción no se comprueba el disco
+TEMPLATES_AUTO_RELOAD = os.getenv("TEMPLATES_AUTO_RELOAD", "no").lower() == "yes"
+# Caché de bytecode compartida entre procesos (workers de uvicorn y de informes)
+TEMPLATES_BYTECODE_CACHE_DIR = os.getenv("TEMPLATES_BYTECODE_CACHE_DIR") or None
+
+env = Environment(
+    loader=FileSystemLoader(TEMPLATES_DIR),
+    autoescape=select_autoescape(["html"]),
+    auto_reload=TEMPLATES_AUTO_RELOAD,
+    bytecode_cache=FileSystemBytecodeCache(TEMPLATES_BYTECODE_CACHE_DIR),
+)
+
+templates = Jinja2Templates(env=env)
+
+def precompile_templates():
+    """Compila todas las plantillas al arrancar para que cada petición solo tenga que renderizar."""
+    for name in env.list_templates(extensions=["html"]):
+        env.get_template(name)
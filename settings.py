@@ -0,0 +1,11 @@
+"""
+Carga .env en las variables de entorno.
+
+Los módulos de la aplicación leen su configuración al importarse, así que cada
+punto de entrada (main.py, seeder.py, los scripts y las migraciones) importa este
+módulo antes que cualquier otro de la aplicación. Las variables ya definidas en el
+entorno tienen prioridad sobre .env.
+"""
+from dotenv import load_dotenv
+
+load_dotenv()